@@ -0,0 +1,438 @@
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from src.day_partition import split_days
+from src.equation import compile_equation
+from src.generate_classification import remove_sensors_without_data_and_variance
+from src.generate_loss_due_to_unavailability import get_losses
+from src.generate_loss_table import get_loss_table
+from src.status import AVAILABLE, STATUS
+from src.stopped_trackers_store import read_stopped_trackers
+from src.storage import load_plants_param, storage_profile, write_parquet
+
+
+def timed(function: Callable, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - begin)
+
+    return min(timings)
+
+
+def synthetic_irradiance(years: int, sensors: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    index = pd.date_range("2020-01-01", periods=years * 365 * 144, freq="10min")
+    hours = (index.hour + index.minute / 60).to_numpy()
+
+    # Curva de irradiância aproximada por um seno entre 6h e 19h, com ruído
+    curve = np.clip(np.sin((hours - 6) / 13 * np.pi), 0, None) * 1000
+
+    data = curve[:, None] * rng.uniform(0.8, 1.1, sensors) + rng.normal(
+        0, 5, (len(index), sensors)
+    )
+
+    return pd.DataFrame(
+        np.clip(data, 0, None),
+        index=index,
+        columns=[f"Piranômetro {i}" for i in range(sensors)],
+    )
+
+
+def benchmark_day_split(args: argparse.Namespace) -> None:
+    print(f"{'anos':>5} {'linhas':>10} {'máscara (s)':>12} {'fatias (s)':>11}")
+
+    for years in args.years:
+        data = synthetic_irradiance(years, args.sensors)
+        date_range = pd.date_range(data.index.min(), data.index.max(), freq="D")
+
+        mask = timed(
+            lambda: [data[data.index.date == date.date()] for date in date_range],
+            repeat=1,
+        )
+        slices = timed(lambda: list(split_days(data, date_range)))
+
+        print(f"{years:>5} {len(data):>10} {mask:>12.3f} {slices:>11.4f}")
+
+
+def legacy_remove_sensors_without_data_and_variance(
+    irradiance: pd.DataFrame, ghi_limits: tuple
+) -> pd.DataFrame:
+    irradiance_limited = irradiance.loc[ghi_limits[0] : ghi_limits[1]]
+
+    irradiance = irradiance.loc[:, irradiance_limited.notna().all()]
+
+    same_value_for_a_time = irradiance_limited.rolling(window=7).apply(
+        lambda x: x.nunique() == 1
+    )
+    irradiance = irradiance.loc[:, ~same_value_for_a_time.any()]
+
+    for sensor in irradiance.columns:
+        irradiance_sensor = irradiance[[sensor]]
+
+        data_time = irradiance_sensor.index.hour * 60 + irradiance_sensor.index.minute
+        data_weights = irradiance_sensor[sensor]
+
+        weighted_mean = (data_time * data_weights).sum() / data_weights.sum()
+
+        squared_deviations = ((data_time - weighted_mean) ** 2) * data_weights
+        weighted_variance = squared_deviations.sum() / data_weights.sum()
+        weighted_standard_deviation = np.sqrt(weighted_variance)
+
+        if weighted_standard_deviation > 130:
+            irradiance = irradiance.drop(columns=[sensor])
+
+    return irradiance
+
+
+def benchmark_sensor_filter(args: argparse.Namespace) -> None:
+    print(f"{'anos':>5} {'períodos':>9} {'anterior (s)':>13} {'vetorizado (s)':>15}")
+
+    for years in args.years:
+        data = synthetic_irradiance(years, args.sensors)
+
+        # Sensores travados em trechos aleatórios e sensores sem dados
+        rng = np.random.default_rng(1)
+        for column in rng.choice(data.columns, args.sensors // 4, replace=False):
+            begin = rng.integers(0, len(data) - 144)
+            data.iloc[begin : begin + 144, data.columns.get_loc(column)] = 500
+        for column in rng.choice(data.columns, args.sensors // 4, replace=False):
+            begin = rng.integers(0, len(data) - 144)
+            data.iloc[begin : begin + 144, data.columns.get_loc(column)] = np.nan
+
+        date_range = pd.date_range(data.index.min(), data.index.max(), freq="D")
+
+        periods = []
+        for day, date in zip(split_days(data, date_range), date_range):
+            ghi_limits = (date + pd.Timedelta(hours=6), date + pd.Timedelta(hours=19))
+            periods.append((day.loc[: date + pd.Timedelta(hours=12)], ghi_limits))
+            periods.append(
+                (day.loc[date + pd.Timedelta(hours=12, seconds=1) :], ghi_limits)
+            )
+
+        def run(function: Callable) -> list[list[str]]:
+            return [function(*period).columns.to_list() for period in periods]
+
+        begin = time.perf_counter()
+        legacy_columns = run(legacy_remove_sensors_without_data_and_variance)
+        legacy = time.perf_counter() - begin
+
+        vectorized = timed(lambda: run(remove_sensors_without_data_and_variance))
+
+        # Os sensores mantidos precisam ser os mesmos da implementação anterior
+        if legacy_columns != run(remove_sensors_without_data_and_variance):
+            raise AssertionError("Os sensores mantidos pelo filtro mudaram")
+
+        print(f"{years:>5} {len(periods):>9} {legacy:>13.3f} {vectorized:>15.3f}")
+
+
+def legacy_loss_due_to_unavailability(
+    unavailability_profile: pd.DataFrame, loss_table: pd.DataFrame, equation: str
+) -> pd.DataFrame:
+    equation = equation.replace("^", "**")
+
+    loss_list = []
+    for date in unavailability_profile["Data"].unique():
+        profile_day = unavailability_profile[unavailability_profile["Data"] == date]
+        loss_table_day = loss_table[loss_table["Data"] == date]
+
+        if loss_table_day.empty:
+            continue
+
+        csi = loss_table_day["CSI"].iloc[0]
+
+        profile_day = profile_day.sort_values("Ângulo médio (°)")
+
+        losses = []
+        for _, row in profile_day.iterrows():
+            angle = row["Ângulo médio (°)"]
+            unavailability_percentage = row["Porcentagem de indisponibilidade (%)"]
+
+            loss = (
+                eval(equation, {"CSI": csi, "Ângulo": angle})
+                * unavailability_percentage
+                / 100
+            )
+
+            losses.append(
+                {
+                    "Data": row["Data"],
+                    "CSI": csi,
+                    "Ângulo médio (°)": angle,
+                    "Porcentagem de indisponibilidade (%)": unavailability_percentage,
+                    "Perda por indisponibilidade (%)": loss,
+                }
+            )
+
+        loss_list.append(pd.DataFrame(losses))
+
+    return pd.concat(loss_list).reset_index(drop=True)
+
+
+def benchmark_loss_due(args: argparse.Namespace) -> None:
+    equation = "0.002 * Ângulo^2 - 1.5 * CSI^3 + 0.1 * abs(Ângulo) * CSI + 2"
+    loss_equation = compile_equation(equation)
+
+    print(f"{'anos':>5} {'linhas':>8} {'anterior (s)':>13} {'vetorizado (s)':>15}")
+
+    for years in args.years:
+        rng = np.random.default_rng(0)
+
+        dates = pd.date_range("2020-01-01", periods=years * 365, freq="D").date
+        angles = np.arange(-60, 65, 5, dtype=float)
+
+        # Perfil com alguns ângulos por dia e uma tabela de perdas sem parte dos dias
+        unavailability_profile = pd.DataFrame(
+            {
+                "Data": np.repeat(dates, 5),
+                "Ângulo médio (°)": rng.choice(angles, len(dates) * 5),
+                "Porcentagem de indisponibilidade (%)": rng.uniform(
+                    0, 10, len(dates) * 5
+                ),
+            }
+        )
+        loss_table_dates = dates[rng.random(len(dates)) > 0.2]
+        loss_table = pd.DataFrame(
+            {
+                "Data": np.repeat(loss_table_dates, len(angles)),
+                "CSI": np.repeat(rng.random(len(loss_table_dates)), len(angles)),
+                "Angulação (°)": np.tile(angles, len(loss_table_dates)),
+            }
+        )
+
+        begin = time.perf_counter()
+        legacy_losses = legacy_loss_due_to_unavailability(
+            unavailability_profile, loss_table, equation
+        )
+        legacy = time.perf_counter() - begin
+
+        vectorized = timed(
+            lambda: get_losses(unavailability_profile, loss_table, loss_equation)
+        )
+
+        losses = get_losses(unavailability_profile, loss_table, loss_equation)
+
+        """ A ordem dos dias e ângulos precisa ser a mesma da implementação anterior.
+        Entre linhas com o mesmo ângulo no mesmo dia, a ordenação anterior não era
+        estável, então os valores são comparados após uma ordenação completa """
+        keys = ["Data", "Ângulo médio (°)"]
+        pd.testing.assert_frame_equal(legacy_losses[keys], losses[keys])
+
+        columns = list(losses.columns)
+        pd.testing.assert_frame_equal(
+            legacy_losses.sort_values(columns).reset_index(drop=True),
+            losses.sort_values(columns).reset_index(drop=True),
+        )
+
+        print(
+            f"{years:>5} {len(unavailability_profile):>8} {legacy:>13.3f} "
+            f"{vectorized:>15.4f}"
+        )
+
+
+def legacy_loss_table(
+    ghi: pd.DataFrame,
+    classification: pd.DataFrame,
+    clearsky: pd.DataFrame,
+    teoric_power: pd.DataFrame,
+    stopped_trackers_power: pd.DataFrame,
+    date_range: pd.DatetimeIndex,
+) -> pd.DataFrame:
+    loss_list = []
+    for ghi_day, class_day, clearsky_day, power_day, stopped_day in zip(
+        split_days(ghi, date_range),
+        split_days(classification, date_range),
+        split_days(clearsky, date_range),
+        split_days(teoric_power, date_range),
+        split_days(stopped_trackers_power, date_range),
+    ):
+        if class_day["GHI"].ne(AVAILABLE).any():
+            continue
+
+        if class_day.drop("GHI", axis=1).ne(AVAILABLE).all(axis=1).any():
+            continue
+
+        clearsky_only_irradiance = clearsky_day[
+            clearsky_day["GHI teórico (clearsky)"] > 0
+        ]
+        ghi_limited = ghi_day.loc[clearsky_only_irradiance.index]
+
+        csi = round(
+            ghi_limited["GHI"].sum() / clearsky_day["GHI teórico (clearsky)"].sum(), 2
+        )
+        csi = min(csi, 1)
+
+        day_power = power_day["Potência teórica GTI"].sum()
+        percentual_loss = round((day_power - stopped_day.sum()) / day_power * 100, 2)
+
+        angle_list = [
+            int(col.split(" ")[-1].split("°")[0]) for col in stopped_day.columns
+        ]
+
+        loss_list.append(
+            pd.DataFrame(
+                {
+                    "Data": ghi_day.index.date[0],
+                    "CSI": csi,
+                    "Angulação (°)": angle_list,
+                    "Perda (%)": percentual_loss.values,
+                }
+            )
+        )
+
+    loss_table = pd.concat(loss_list)
+    loss_table = loss_table.sort_values(["Data", "Angulação (°)"])
+
+    return loss_table.reset_index(drop=True)
+
+
+def benchmark_loss_table(args: argparse.Namespace) -> None:
+    print(f"{'anos':>5} {'dias':>6} {'anterior (s)':>13} {'vetorizado (s)':>15}")
+
+    for years in args.years:
+        rng = np.random.default_rng(0)
+
+        irradiance = synthetic_irradiance(years, 2)
+
+        ghi = irradiance.iloc[:, [0]].set_axis(["GHI"], axis=1)
+        clearsky = (irradiance.iloc[:, [1]] * 1.2).set_axis(
+            ["GHI teórico (clearsky)"], axis=1
+        )
+
+        date_range = pd.date_range(ghi.index.min(), ghi.index.max(), freq="D")
+
+        # Dois períodos por dia, com parte dos sensores indisponíveis
+        periods = np.sort(
+            np.concatenate([date_range, date_range + pd.Timedelta(hours=12)])
+        )
+        codes = rng.choice(3, (len(periods), args.sensors + 1), p=[0.8, 0.1, 0.1])
+        classification = pd.DataFrame(
+            {
+                column: pd.Categorical.from_codes(codes[:, i], dtype=STATUS)
+                for i, column in enumerate(
+                    [f"Piranômetro {i}" for i in range(args.sensors)] + ["GHI"]
+                )
+            },
+            index=periods,
+        )
+
+        angles = range(-60, 65, 5)
+        teoric_power = (ghi * 100).set_axis(["Potência teórica GTI"], axis=1)
+        stopped_trackers_power = pd.DataFrame(
+            {
+                angle: teoric_power.iloc[:, 0]
+                * (1 - abs(angle) / 200)
+                * rng.normal(1, 0.01, len(ghi))
+                for angle in angles
+            }
+        )
+
+        frames = [ghi, classification, clearsky, teoric_power, stopped_trackers_power]
+
+        # A implementação anterior lia o parquet largo, com o ângulo no nome da coluna
+        legacy_frames = frames[:-1] + [
+            stopped_trackers_power.rename(columns=lambda a: f"Potência teórica {a}°")
+        ]
+
+        begin = time.perf_counter()
+        legacy_table = legacy_loss_table(*legacy_frames, date_range)
+        legacy = time.perf_counter() - begin
+
+        vectorized = timed(lambda: get_loss_table(*frames, date_range))
+
+        # A tabela precisa ser idêntica à da implementação anterior
+        pd.testing.assert_frame_equal(
+            legacy_table, get_loss_table(*frames, date_range), check_exact=True
+        )
+
+        print(f"{years:>5} {len(date_range):>6} {legacy:>13.3f} {vectorized:>15.4f}")
+
+
+def directory_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+def benchmark_storage(args: argparse.Namespace) -> None:
+    plants_param = load_plants_param()
+
+    print(
+        f"{'dataset':>28} {'antes (MB)':>11} {'depois (MB)':>12} "
+        f"{'leitura antes (s)':>18} {'leitura depois (s)':>19}"
+    )
+
+    for solar_plant in args.plant or list(plants_param.keys()):
+        print(solar_plant)
+
+        for dataset, path in plants_param[solar_plant]["datawarehouse"].items():
+            if not os.path.exists(path):
+                continue
+
+            if dataset == "stopped_trackers_power":
+                data = read_stopped_trackers(path)
+            else:
+                data = pd.read_parquet(path)
+
+            # Compara o dataset salvo com os padrões do pandas e com o perfil da usina
+            with tempfile.TemporaryDirectory() as directory:
+                before_path = os.path.join(directory, "antes.parquet")
+                after_path = os.path.join(directory, "depois.parquet")
+
+                write_parquet(data, before_path)
+                write_parquet(data, after_path, storage_profile(path))
+
+                before_size = directory_size(before_path) / 2**20
+                after_size = directory_size(after_path) / 2**20
+
+                before_read = timed(lambda: pd.read_parquet(before_path))
+                after_read = timed(lambda: pd.read_parquet(after_path))
+
+            print(
+                f"{dataset:>28} {before_size:>11.2f} {after_size:>12.2f} "
+                f"{before_read:>18.3f} {after_read:>19.3f}"
+            )
+
+
+BENCHMARKS = {
+    "day_split": benchmark_day_split,
+    "sensor_filter": benchmark_sensor_filter,
+    "loss_due": benchmark_loss_due,
+    "loss_table": benchmark_loss_table,
+    "storage": benchmark_storage,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Mede o desempenho das etapas do pipeline com dados sintéticos"
+        " e o armazenamento do datawarehouse"
+    )
+    parser.add_argument("benchmark", choices=list(BENCHMARKS.keys()))
+    parser.add_argument("--years", nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument(
+        "--plant",
+        nargs="+",
+        help="Usinas do relatório de armazenamento (padrão: todas)",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    BENCHMARKS[args.benchmark](args)
@@ -1,43 +1,67 @@
-import json
+import argparse
 
-import structlog
-from src.generate_classification import generate_classification
-from src.generate_clearsky import generate_clearsky
-from src.generate_gti_ghi_ca import generate_gti_ghi_ca
-from src.generate_loss_due_to_unavailability import generate_loss_due_to_unavailability
-from src.generate_loss_table import generate_loss_table
-from src.generate_stopped_trackers_power import generate_stopped_trackers_power
-from src.generate_teoric_irradiance import generate_teoric_irradiance
-from src.generate_teoric_power import generate_teoric_power
-from src.generate_wind_speed_amb_temp import generate_wind_speed_amb_temp
+from src import parallel
+from src.pipeline import PLANTS_PARAM, STAGES, run_pipeline
 
-PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
-if __name__ == "__main__":
-    log = structlog.get_logger()
-
-    for solar_plant in PLANTS_PARAM.keys():
-        log.info(f"Populando os dados da usina {solar_plant}...\n")
-
-        generate_clearsky(solar_plant)
-
-        generate_gti_ghi_ca(solar_plant, True)
-        generate_gti_ghi_ca(solar_plant, False)
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Povoa o datawarehouse executando apenas as etapas desatualizadas"
+    )
+    parser.add_argument(
+        "--plant",
+        nargs="+",
+        choices=list(PLANTS_PARAM.keys()),
+        help="Usinas a serem processadas (padrão: todas)",
+    )
+    parser.add_argument(
+        "--stage",
+        nargs="+",
+        choices=list(STAGES.keys()),
+        help="Etapas a serem executadas (padrão: todas)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Executa as etapas selecionadas mesmo sem alterações nas entradas",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Processa apenas os dias novos ou alterados, salvando datasets particionados por mês",
+    )
+    parser.add_argument(
+        "--arrow-handoff",
+        action="store_true",
+        help="Repassa as saídas entre as etapas em Arrow IPC com memory map, sem descompactar o parquet",
+    )
 
-        generate_wind_speed_amb_temp(solar_plant)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Etapas executadas simultaneamente, de uma ou mais usinas (padrão: 1)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"Orçamento global de workers, dividido entre as etapas simultâneas (padrão: ${parallel.WORKERS_ENV} ou todos os núcleos)",
+    )
 
-        generate_classification(solar_plant)
+    return parser.parse_args()
 
-        generate_teoric_irradiance(solar_plant, True)
-        generate_teoric_irradiance(solar_plant, False)
 
-        generate_teoric_power(solar_plant, True)
-        generate_teoric_power(solar_plant, False)
-
-        generate_stopped_trackers_power(solar_plant)
-
-        generate_loss_table(solar_plant)
+if __name__ == "__main__":
+    args = parse_args()
 
-        generate_loss_due_to_unavailability(solar_plant)
+    if args.workers is not None:
+        parallel.set_budget(args.workers)
 
-        print("\n")
+    run_pipeline(
+        args.plant,
+        args.stage,
+        args.force,
+        args.incremental,
+        args.arrow_handoff,
+        max(args.jobs, 1),
+    )
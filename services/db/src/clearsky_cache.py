@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+""" Cache em disco do GHI de céu limpo, particionado por localização e ano.
+Não depende do pvlib, podendo ser lido pelas dashboards e notebooks. O caminho é
+relativo à raiz do repositório, e não ao diretório de execução """
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CACHE_DIR = os.path.join(ROOT_DIR, "resources", "cache", "clearsky")
+LOCATION_KEYS = ["latitude", "longitude", "altitude", "tz"]
+
+
+def location_key(location: dict) -> str:
+    values = {key: location[key] for key in LOCATION_KEYS}
+
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def cache_path(location: dict, year: int | None = None) -> str:
+    path = os.path.join(CACHE_DIR, location_key(location))
+
+    if year is None:
+        return path
+
+    return os.path.join(path, f"{year}.parquet")
+
+
+def empty_clearsky() -> pd.DataFrame:
+    return pd.DataFrame({"ghi": pd.Series(dtype="float64", index=pd.DatetimeIndex([]))})
+
+
+def read_year(location: dict, year: int) -> pd.DataFrame:
+    path = cache_path(location, year)
+
+    if not os.path.exists(path):
+        return empty_clearsky()
+
+    return pd.read_parquet(path)
+
+
+def read_clearsky(
+    location: dict,
+    begin: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    path = cache_path(location)
+
+    # Um diretório ausente indica localização ainda não calculada pelo pipeline
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"Cache do clearsky não encontrado: {path}")
+
+    years = sorted(
+        int(filename.removesuffix(".parquet"))
+        for filename in os.listdir(path)
+        if filename.endswith(".parquet")
+    )
+
+    # Apenas os anos dentro do intervalo pedido são lidos
+    if begin is not None:
+        years = [year for year in years if year >= pd.Timestamp(begin).year]
+    if end is not None:
+        years = [year for year in years if year <= pd.Timestamp(end).year]
+
+    if not years:
+        return empty_clearsky()
+
+    clearsky = pd.concat([read_year(location, year) for year in years])
+
+    return clearsky.loc[begin:end]
+
+
+def missing_dates(location: dict, dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    dates = pd.DatetimeIndex(dates)
+
+    cached = pd.DatetimeIndex([])
+    for year in dates.year.unique():
+        cached = cached.union(read_year(location, year).index.normalize().unique())
+
+    return dates[~dates.normalize().isin(cached)]
+
+
+def extend_cache(location: dict, clearsky: pd.DataFrame) -> None:
+    os.makedirs(cache_path(location), exist_ok=True)
+
+    for year, clearsky_year in clearsky.groupby(clearsky.index.year):
+        cached = read_year(location, year)
+        cached = cached[~cached.index.isin(clearsky_year.index)]
+
+        if not cached.empty:
+            clearsky_year = pd.concat([cached, clearsky_year]).sort_index()
+
+        # Escrita atômica para que leitores concorrentes não vejam arquivos parciais
+        path = cache_path(location, year)
+        tmp_path = os.path.join(
+            cache_path(location), f".{year}.parquet.{os.getpid()}.tmp"
+        )
+
+        clearsky_year.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
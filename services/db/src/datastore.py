@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+from src.handoff import read_arrow
+
+""" Leitura compartilhada dos datasets do datalake e do datawarehouse durante uma
+execução. Cada coluna é lida uma única vez (com memory map) e reaproveitada pelas
+etapas seguintes, até que o arquivo mude ou o cache seja limpo. Os DataFrames
+retornados compartilham a memória do cache e não devem ser alterados in-place """
+CACHE: dict[str, dict] = {}
+
+# Datasets derivados que, sem caminho próprio no solar_plants.json, são gravados ao
+# lado do dataset de origem
+DERIVED_DATASETS = {
+    "loss_csi_interval": "loss_table",
+    "loss_csi_quantile": "loss_table",
+}
+
+
+def list_files(path: str) -> list[str]:
+    if os.path.isfile(path):
+        return [path]
+
+    # Datasets particionados do modo incremental são diretórios
+    return sorted(
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+def signature(path: str) -> tuple:
+    return tuple(
+        (file, os.stat(file).st_mtime_ns, os.stat(file).st_size)
+        for file in list_files(path)
+    )
+
+
+def datawarehouse_path(datawarehouse: dict, dataset: str) -> str:
+    if dataset in datawarehouse or dataset not in DERIVED_DATASETS:
+        return datawarehouse[dataset]
+
+    source = datawarehouse[DERIVED_DATASETS[dataset]]
+    extension = os.path.splitext(source)[1]
+
+    return os.path.join(os.path.dirname(source), f"{dataset}{extension}")
+
+
+def load(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    # Saídas desta execução são lidas da cópia em Arrow IPC, quando houver
+    data = read_arrow(path)
+
+    if data is None:
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+
+    return data if columns is None else data[columns]
+
+
+def read_dataset(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    current = signature(path)
+
+    # Arquivos reescritos por uma etapa anterior invalidam as colunas em cache
+    entry = CACHE.get(path)
+    if entry is None or entry["signature"] != current:
+        entry = {"signature": current, "index": None, "columns": {}, "order": None}
+        CACHE[path] = entry
+
+    if columns is None:
+        if entry["order"] is None:
+            data = load(path)
+
+            entry["index"] = data.index
+            entry["columns"].update(data.items())
+            entry["order"] = list(data.columns)
+
+        columns = entry["order"]
+    else:
+        missing = [column for column in columns if column not in entry["columns"]]
+
+        if missing:
+            data = load(path, missing)
+
+            entry["index"] = data.index
+            entry["columns"].update(data.items())
+
+    return pd.DataFrame(
+        {column: entry["columns"][column] for column in columns},
+        index=entry["index"],
+        copy=False,
+    )
+
+
+def clear() -> None:
+    CACHE.clear()
@@ -0,0 +1,29 @@
+from typing import Iterator
+
+import pandas as pd
+
+
+def day_slices(data: pd.DataFrame, date_range: pd.DatetimeIndex) -> list[slice]:
+    index = pd.DatetimeIndex(data.index)
+
+    if not index.is_monotonic_increasing:
+        raise ValueError("O índice precisa estar ordenado para separar os dias")
+
+    days = pd.DatetimeIndex(date_range).normalize()
+
+    # Busca binária dos limites de cada dia no índice ordenado
+    starts = index.searchsorted(days, side="left")
+    ends = index.searchsorted(days + pd.Timedelta(days=1), side="left")
+
+    return [slice(start, end) for start, end in zip(starts, ends)]
+
+
+def split_days(
+    data: pd.DataFrame, date_range: pd.DatetimeIndex
+) -> Iterator[pd.DataFrame]:
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+
+    # Fatias posicionais não copiam os dados do DataFrame original
+    for day in day_slices(data, date_range):
+        yield data.iloc[day]
@@ -0,0 +1,80 @@
+import ast
+from typing import Callable
+
+import numpy as np
+
+""" Compilador das equações de perda do solar_plants.json. Apenas números, as
+variáveis abaixo, operadores aritméticos e o abs são aceitos, de modo que
+carregar uma configuração nunca executa código arbitrário """
+VARIABLES = ["CSI", "Ângulo"]
+
+# O np.power pode diferir no último bit do operador ** do Python
+PYTHON_POWER = np.frompyfunc(pow, 2, 1)
+
+
+def power(base: np.ndarray, exponent: np.ndarray) -> np.ndarray:
+    return np.asarray(PYTHON_POWER(base, exponent), dtype=np.float64)
+
+
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Mod: np.mod,
+    ast.Pow: power,
+}
+UNARY_OPERATORS = {ast.UAdd: np.positive, ast.USub: np.negative}
+FUNCTIONS = {"abs": np.abs}
+
+
+def build(node: ast.AST) -> Callable[[dict], np.ndarray]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = np.float64(node.value)
+        return lambda variables: value
+
+    if isinstance(node, ast.Name) and node.id in VARIABLES:
+        return lambda variables: variables[node.id]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        operator = BINARY_OPERATORS[type(node.op)]
+        left, right = build(node.left), build(node.right)
+        return lambda variables: operator(left(variables), right(variables))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        operator = UNARY_OPERATORS[type(node.op)]
+        operand = build(node.operand)
+        return lambda variables: operator(operand(variables))
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in FUNCTIONS
+        and len(node.args) == 1
+        and not node.keywords
+    ):
+        function = FUNCTIONS[node.func.id]
+        argument = build(node.args[0])
+        return lambda variables: function(argument(variables))
+
+    raise ValueError(f"Expressão não permitida na equação: {ast.unparse(node)}")
+
+
+def compile_equation(equation: str) -> Callable[..., np.ndarray]:
+    # O "^" das equações é potência, com a mesma precedência do "**"
+    try:
+        tree = ast.parse(equation.replace("^", "**"), mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Equação inválida: {equation}") from error
+
+    evaluate = build(tree.body)
+
+    def loss(csi: np.ndarray, angle: np.ndarray) -> np.ndarray:
+        variables = {
+            "CSI": np.asarray(csi, dtype=np.float64),
+            "Ângulo": np.asarray(angle, dtype=np.float64),
+        }
+
+        return evaluate(variables)
+
+    return loss
@@ -3,12 +3,49 @@ import json
 import numpy as np
 import pandas as pd
 import structlog
-from joblib import Parallel, delayed
+from src.datastore import read_dataset
+from src.day_partition import split_days
 from src.generate_gti_ghi_ca import calculate_period_limits
+from src.incremental import save, select_days, update_days
+from src.status import AVAILABLE, STOW, UNAVAILABLE, from_codes, status_code
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
 
+def stuck_sensors(irradiance: pd.DataFrame, window: int = 7) -> np.ndarray:
+    values = irradiance.to_numpy(dtype=float)
+
+    if len(values) < window:
+        return np.zeros(values.shape[1], dtype=bool)
+
+    # Amostras iguais à anterior (NaN nunca é igual), acumuladas por sensor
+    repeated = np.cumsum(values[1:] == values[:-1], axis=0)
+    repeated = np.pad(repeated, ((1, 0), (0, 0)))
+
+    # Uma janela de "window" amostras constantes possui "window - 1" repetições seguidas
+    repeated_in_window = repeated[window - 1 :] - repeated[: -(window - 1)]
+
+    return (repeated_in_window == window - 1).any(axis=0)
+
+
+def weighted_time_standard_deviation(irradiance: pd.DataFrame) -> pd.Series:
+    data_time = (irradiance.index.hour * 60 + irradiance.index.minute).to_numpy()
+    data_weights = irradiance.to_numpy(dtype=float)
+
+    weights_sum = np.nansum(data_weights, axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Cálculo da média ponderada dos valores
+        weighted_mean = np.nansum(data_time[:, None] * data_weights, axis=0)
+        weighted_mean = weighted_mean / weights_sum
+
+        # Cálculo do desvio padrão ponderado
+        squared_deviations = (data_time[:, None] - weighted_mean) ** 2 * data_weights
+        weighted_variance = np.nansum(squared_deviations, axis=0) / weights_sum
+
+    return pd.Series(np.sqrt(weighted_variance), index=irradiance.columns)
+
+
 def remove_sensors_without_data_and_variance(
     irradiance: pd.DataFrame, ghi_limits: tuple
 ) -> pd.DataFrame:
@@ -19,33 +56,18 @@ def remove_sensors_without_data_and_variance(
     irradiance = irradiance.loc[:, irradiance_limited.notna().all()]
 
     # Verificação se os dados do sensor são constantes por, pelo menos, 7 amostras consecutivas
-    same_value_for_a_time = irradiance_limited.rolling(window=7).apply(
-        lambda x: x.nunique() == 1
+    same_value_for_a_time = pd.Series(
+        stuck_sensors(irradiance_limited), index=irradiance_limited.columns
     )
-    irradiance = irradiance.loc[:, ~same_value_for_a_time.any()]
+    irradiance = irradiance.loc[:, ~same_value_for_a_time]
 
     value = (
         130  # Valor de referência para o desvio padrão ponderado (ajuste se necessário)
     )
 
-    for sensor in irradiance.columns:
-        irradiance_sensor = irradiance[[sensor]]
-
-        data_time = irradiance_sensor.index.hour * 60 + irradiance_sensor.index.minute
-        data_weights = irradiance_sensor[sensor]
+    weighted_standard_deviation = weighted_time_standard_deviation(irradiance)
 
-        # Cálculo da média ponderada dos valores
-        weighted_mean = (data_time * data_weights).sum() / data_weights.sum()
-
-        # Cálculo do desvio padrão ponderado
-        squared_deviations = ((data_time - weighted_mean) ** 2) * data_weights
-        weighted_variance = squared_deviations.sum() / data_weights.sum()
-        weighted_standard_deviation = np.sqrt(weighted_variance)
-
-        if weighted_standard_deviation > value:
-            irradiance = irradiance.drop(columns=[sensor])
-
-    return irradiance
+    return irradiance.loc[:, ~(weighted_standard_deviation > value)]
 
 
 def remove_sensors_different_from_the_reference(
@@ -57,18 +79,9 @@ def remove_sensors_different_from_the_reference(
         5e3  # Valor de referência para a distância máxima (ajuste se necessário)
     )
 
-    for sensor in irradiance.columns:
-        irradiance_sensor = irradiance[[sensor]]
-
-        sum_irradiance = sum(irradiance_sensor[sensor])
-        sum_reference = sum(reference)
-
-        distance = sum_irradiance - sum_reference
-
-        if distance < -max_distance:
-            irradiance = irradiance.drop(columns=[sensor])
+    distance = irradiance.sum(skipna=False) - reference.sum(skipna=False)
 
-    return irradiance
+    return irradiance.loc[:, ~(distance < -max_distance)]
 
 
 def filter_data(
@@ -85,130 +98,156 @@ def filter_data(
     return data_filtered
 
 
-def classify_period_without_irradiance(gti: pd.DataFrame) -> pd.DataFrame:
-    classification = pd.DataFrame(columns=gti.columns, index=[gti.index.min()])
+def classify_periods_without_irradiance(gti: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gti_avg = np.nansum(gti, axis=1) / np.sum(~np.isnan(gti), axis=1)
 
-    gti_avg = gti.mean()
-    max_avg = gti_avg.max()
-    mean_max = gti_avg / max_avg
+    max_avg = np.fmax.reduce(gti_avg, axis=1)
+    mean_max = gti_avg / max_avg[:, None]
 
-    for sensor in gti.columns:
-        sensor_relation = mean_max[sensor]
+    return mean_max > 0.8  # Ajuste este valor conforme necessário
 
-        if sensor_relation > 0.8:  # Ajuste este valor conforme necessário
-            classification[sensor] = "Disponível"
-        else:
-            classification[sensor] = "Stow"
 
-    return classification
+def classify_periods_with_irradiance(gti: np.ndarray, ghi: np.ndarray) -> np.ndarray:
+    # "gti" (períodos × tempo × sensores) e "ghi" (períodos × tempo) possuem NaN nos
+    # sensores removidos pelo filtro e no preenchimento dos períodos mais curtos
+    present = ~np.isnan(gti).all(axis=1)
 
-
-def classify_period_with_irradiance(
-    gti: pd.DataFrame, ghi: pd.DataFrame
-) -> pd.DataFrame:
-    ghi = ghi.iloc[:, 0]
-    ghi_sum = ghi.sum()
+    ghi_sum = np.nansum(ghi, axis=1)
+    ghi = ghi[:, :, None]
 
     # Limiar para identificar sensores próximos ao GHI
     ghi_threshold = 0.25 * ghi_sum
 
     # Removendo sensores próximos ao GHI do cálculo de máximo e média
-    near_ghi_mask = gti.sub(ghi, axis=0).abs().sum() < ghi_threshold
-    filtered_gti = gti.loc[:, ~near_ghi_mask]
-
-    gti_max = gti.max(axis=1)
-    gti_mean = gti.mean(axis=1) if filtered_gti.empty else filtered_gti.mean(axis=1)
+    near_ghi_mask = np.nansum(np.abs(gti - ghi), axis=1) < ghi_threshold[:, None]
+    filtered_mask = present & ~near_ghi_mask
+    mean_mask = np.where(filtered_mask.any(axis=1)[:, None], filtered_mask, present)
 
-    classification = pd.DataFrame(columns=gti.columns, index=[gti.index.min()])
+    gti_max = np.fmax.reduce(gti, axis=2)[:, :, None]
 
-    for sensor in gti.columns:
-        irradiance_sensor = gti[sensor]
-
-        # Cálculo do erro médio quadrático
-        mse1 = ((irradiance_sensor - ghi) ** 2).sum()
-        mse2 = ((irradiance_sensor - gti_max) ** 2).sum()
-        mse3 = ((irradiance_sensor - gti_mean) ** 2).sum()
+    gti_filtered = np.where(mean_mask[:, None, :], gti, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gti_mean = np.nansum(gti_filtered, axis=2) / np.sum(
+            ~np.isnan(gti_filtered), axis=2
+        )
+    gti_mean = gti_mean[:, :, None]
 
-        # Em casos onde apenas um sensor está disponível, deve-se observar se o valor da curva GTI está muito próximo ao GHI
-        diff_ghi = abs(irradiance_sensor - ghi).sum()
-        diff_mean = abs(irradiance_sensor - gti_mean).sum()
+    # Cálculo do erro médio quadrático
+    mse1 = np.nansum((gti - ghi) ** 2, axis=1)
+    mse2 = np.nansum((gti - gti_max) ** 2, axis=1)
+    mse3 = np.nansum((gti - gti_mean) ** 2, axis=1)
 
-        condition_1 = (mse1 - mse3) ** 2 < (mse2 - mse3) ** 2 or mse1 > mse2
-        condition_2 = diff_ghi < 0.025 * ghi_sum and diff_mean < 0.025 * gti_mean.sum()
+    # Em casos onde apenas um sensor está disponível, deve-se observar se o valor da curva GTI está muito próximo ao GHI
+    diff_ghi = np.nansum(np.abs(gti - ghi), axis=1)
+    diff_mean = np.nansum(np.abs(gti - gti_mean), axis=1)
 
-        if condition_1 and not condition_2:
-            classification[sensor] = "Disponível"
-        else:
-            classification[sensor] = "Stow"
+    condition_1 = ((mse1 - mse3) ** 2 < (mse2 - mse3) ** 2) | (mse1 > mse2)
+    condition_2 = (diff_ghi < 0.025 * ghi_sum[:, None]) & (
+        diff_mean < 0.025 * np.nansum(gti_mean, axis=1)
+    )
 
-    return classification
+    return condition_1 & ~condition_2
 
 
-def process_day(
+def filter_periods(
     gti: pd.DataFrame,
     ghi: pd.DataFrame,
     clearsky: pd.DataFrame,
-) -> pd.DataFrame:
+) -> list[tuple[pd.DataFrame, pd.DataFrame]]:
     irradiance_limits, ghi_limits = calculate_period_limits(clearsky)
 
-    classification = pd.DataFrame()
+    return [
+        (filter_data(gti, ghi_limits, period), filter_data(ghi, ghi_limits, period))
+        for period in irradiance_limits.values()
+    ]
 
-    for period in irradiance_limits.values():
-        gti_filtered = filter_data(gti, ghi_limits, period)
-        ghi_filtered = filter_data(ghi, ghi_limits, period)
 
-        if ghi_filtered.empty:
-            period_classification = classify_period_without_irradiance(gti_filtered)
+def classify_periods(
+    periods: list[tuple[pd.DataFrame, pd.DataFrame]],
+    gti_columns: pd.Index,
+    ghi_columns: pd.Index,
+) -> pd.DataFrame:
+    # GTI e GHI são pareados pelo horário, na união dos índices de cada período
+    # (como no alinhamento do pandas), e não pela posição
+    indexes = [gti.index.union(ghi.index) for gti, ghi in periods]
+    length = max((len(index) for index in indexes), default=0)
 
-            period_classification[ghi.columns] = "Indisponível"
-        else:
-            period_classification = classify_period_with_irradiance(
-                gti_filtered, ghi_filtered
-            )
+    # Matrizes (períodos × tempo × sensores) preenchidas com NaN
+    gti_matrix = np.full((len(periods), length, len(gti_columns)), np.nan)
+    ghi_matrix = np.full((len(periods), length), np.nan)
 
-            period_classification[ghi.columns] = "Disponível"
+    for i, ((gti, ghi), index) in enumerate(zip(periods, indexes)):
+        gti_matrix[i][: len(index), gti_columns.get_indexer(gti.columns)] = gti.reindex(
+            index
+        ).to_numpy()
 
-        if classification.empty:
-            classification = period_classification
-        else:
-            classification = pd.concat([classification, period_classification])
+        if not ghi.empty:
+            ghi_matrix[i, : len(index)] = ghi.iloc[:, 0].reindex(index).to_numpy()
 
-    return classification
+    with_irradiance = np.array([not ghi.empty for _, ghi in periods], dtype=bool)
 
+    available = np.where(
+        with_irradiance[:, None],
+        classify_periods_with_irradiance(gti_matrix, ghi_matrix),
+        classify_periods_without_irradiance(gti_matrix),
+    )
 
-def generate_classification(solar_plant: str) -> None:
-    log = structlog.get_logger()
+    # Sensores removidos pelo filtro são classificados como indisponíveis
+    present = np.zeros(available.shape, dtype=bool)
+    for i, (gti, _) in enumerate(periods):
+        present[i, gti_columns.get_indexer(gti.columns)] = True
 
-    log.info("Gerando variável", var="classification")
+    gti_codes = np.where(available, status_code(AVAILABLE), status_code(STOW))
+    gti_codes[~present] = status_code(UNAVAILABLE)
 
-    gti = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["gti_avg"])
-    ghi = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
-    clearsky = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
+    ghi_codes = np.where(
+        with_irradiance, status_code(AVAILABLE), status_code(UNAVAILABLE)
+    )
+    ghi_codes = np.repeat(ghi_codes[:, None], len(ghi_columns), axis=1)
 
-    begin = gti.index.min()
-    end = gti.index.max()
+    return from_codes(
+        np.hstack([gti_codes, ghi_codes]).astype(np.int8),
+        gti_columns.to_list() + ghi_columns.to_list(),
+        [gti.index.min() for gti, _ in periods],
+    )
 
-    date_range = pd.date_range(begin, end, freq="D")
 
-    classification_list = Parallel(n_jobs=-1)(
-        delayed(process_day)(
-            gti[gti.index.date == date.date()],
-            ghi[ghi.index.date == date.date()],
-            clearsky[clearsky.index.date == date.date()],
-        )
-        for date in date_range
-    )
+def generate_classification(solar_plant: str, incremental: bool = False) -> None:
+    log = structlog.get_logger()
 
-    classification = pd.concat(classification_list)
+    log.info("Gerando variável", var="classification")
 
-    classification = pd.DataFrame(
-        classification, columns=(gti.columns.to_list() + ghi.columns.to_list())
-    )
+    gti = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["gti_avg"])
+    ghi = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
+    clearsky = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
+
+    def process(date_range: pd.DatetimeIndex) -> pd.DataFrame:
+        periods = [
+            period
+            for gti_day, ghi_day, clearsky_day in zip(
+                split_days(gti, date_range),
+                split_days(ghi, date_range),
+                split_days(clearsky, date_range),
+            )
+            for period in filter_periods(gti_day, ghi_day, clearsky_day)
+        ]
 
-    classification = classification.fillna("Indisponível")
+        # Todos os dias e períodos são classificados em uma única chamada
+        return classify_periods(periods, gti.columns, ghi.columns)
 
     path = PLANTS_PARAM[solar_plant]["datawarehouse"]["classification"]
 
-    classification.to_parquet(path)
+    if incremental:
+        clearsky_days = select_days(clearsky, gti.index.normalize().unique())
+
+        update_days(path, process, [gti, ghi, clearsky_days])
+    else:
+        begin = gti.index.min()
+        end = gti.index.max()
+
+        date_range = pd.date_range(begin, end, freq="D")
+
+        save(process(date_range), path)
 
-    log.info("Dados salvos", filename=path)
+        log.info("Dados salvos", filename=path)
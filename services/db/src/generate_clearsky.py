@@ -3,23 +3,27 @@ import os
 
 import pandas as pd
 import structlog
-from joblib import Parallel, delayed
 from pvlib.location import Location
+from src.clearsky_cache import extend_cache, missing_dates, read_clearsky
+from src.datastore import read_dataset
+from src.incremental import save, select_days, update_days
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
 
-def get_clear_sky(solar_plant: str, date: pd.Timestamp) -> pd.Series:
-    loc = PLANTS_PARAM[solar_plant]["location"]
-
-    times = pd.date_range(
+def day_times(date: pd.Timestamp, tz: str) -> pd.DatetimeIndex:
+    return pd.date_range(
         start=date,
         end=date + pd.Timedelta(days=1),
         freq="10min",
         inclusive="left",
-        tz=loc["tz"],
+        tz=tz,
     )
 
+
+def get_clear_sky(solar_plant: str, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    loc = PLANTS_PARAM[solar_plant]["location"]
+
     location = Location(
         latitude=loc["latitude"],
         longitude=loc["longitude"],
@@ -27,39 +31,70 @@ def get_clear_sky(solar_plant: str, date: pd.Timestamp) -> pd.Series:
         altitude=loc["altitude"],
     )
 
-    clearsky = location.get_clearsky(times)
-    clearsky.index = pd.to_datetime(clearsky.index)
-    clearsky.index = clearsky.index.tz_localize(None)
+    clearsky_list = []
+
+    # Uma chamada vetorizada por mês mantém a memória limitada
+    for _, month_dates in dates.to_series().groupby(dates.to_period("M")):
+        times = day_times(month_dates.iloc[0], loc["tz"])
+        times = times.append([day_times(date, loc["tz"]) for date in month_dates[1:]])
+
+        clearsky = location.get_clearsky(times)
+        clearsky.index = pd.to_datetime(clearsky.index)
+        clearsky.index = clearsky.index.tz_localize(None)
 
-    return clearsky[["ghi"]]
+        clearsky_list.append(clearsky[["ghi"]])
 
+    return pd.concat(clearsky_list)
 
-def generate_clearsky(solar_plant: str) -> None:
+
+def generate_clearsky(solar_plant: str, incremental: bool = False) -> None:
     log = structlog.get_logger()
 
     log.info("Gerando variável", var="clearsky")
 
-    ghi = pd.read_parquet(PLANTS_PARAM[solar_plant]["datalake"]["ghi"])
+    ghi = read_dataset(PLANTS_PARAM[solar_plant]["datalake"]["ghi"])
 
     begin = ghi["timestamp"].min()
     end = ghi["timestamp"].max()
 
     date_range = pd.date_range(start=begin, end=end, freq="D")
 
-    clearsky = Parallel(n_jobs=-1)(
-        delayed(get_clear_sky)(solar_plant, date) for date in date_range
-    )
+    location = PLANTS_PARAM[solar_plant]["location"]
 
-    clearsky = pd.concat(clearsky)
-    clearsky = clearsky.rename(
-        columns={"index": "timestamp", "ghi": "GHI teórico (clearsky)"}
-    )
+    def process(dates: pd.DatetimeIndex) -> pd.DataFrame:
+        missing = missing_dates(location, dates)
+
+        # Apenas as datas ausentes do cache são calculadas com o pvlib
+        if not missing.empty:
+            log.info("Calculando clearsky ausente do cache", days=len(missing))
+
+            extend_cache(location, get_clear_sky(solar_plant, missing))
+
+        clearsky = read_clearsky(
+            location, dates.min(), dates.max() + pd.Timedelta(days=1, seconds=-1)
+        )
+        clearsky = select_days(clearsky, dates)
+        clearsky = clearsky.rename(
+            columns={"index": "timestamp", "ghi": "GHI teórico (clearsky)"}
+        )
+
+        return clearsky
 
     path = PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"]
 
     if not os.path.exists(path):
-        os.makedirs(os.path.dirname(path))
-
-    clearsky.to_parquet(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if incremental:
+        # O clearsky de um dia depende apenas da data e da localização da usina
+        update_days(
+            path,
+            process,
+            [pd.DataFrame(index=date_range)],
+            salt=json.dumps(location, sort_keys=True),
+        )
+        return
+
+    save(process(date_range), path)
 
     log.info("Dados salvos", filename=path)
@@ -4,6 +4,10 @@ import math
 import pandas as pd
 import structlog
 from joblib import Parallel, delayed
+from src import parallel
+from src.datastore import read_dataset
+from src.day_partition import split_days
+from src.incremental import save, select_days, update_days
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
@@ -12,7 +16,7 @@ def read_data(solar_plant: str, type_data: str) -> pd.DataFrame:
     path = PLANTS_PARAM[solar_plant]["datalake"][type_data]
 
     try:
-        data = pd.read_parquet(path)
+        data = read_dataset(path)
 
         data = data.set_index("timestamp")
         data.index = pd.to_datetime(data.index)
@@ -80,12 +84,11 @@ def solar_filter(irradiance: pd.DataFrame, clearsky: pd.DataFrame) -> pd.DataFra
     date_range = pd.date_range(begin, end, freq="D")
 
     # Processando os dias em paralelo usando joblib
-    irradiance_filtered_list = Parallel(n_jobs=-1)(
-        delayed(process_day)(
-            irradiance[irradiance.index.date == date.date()],
-            clearsky[clearsky.index.date == date.date()],
+    irradiance_filtered_list = Parallel(n_jobs=parallel.budget())(
+        delayed(process_day)(irradiance_day, clearsky_day)
+        for irradiance_day, clearsky_day in zip(
+            split_days(irradiance, date_range), split_days(clearsky, date_range)
         )
-        for date in date_range
     )
 
     irradiance_filtered = pd.concat(irradiance_filtered_list)
@@ -93,46 +96,97 @@ def solar_filter(irradiance: pd.DataFrame, clearsky: pd.DataFrame) -> pd.DataFra
     return irradiance_filtered
 
 
+def moving_average(data: pd.DataFrame) -> pd.DataFrame:
+    window = 11
+
+    data = data.rolling(window=window).mean()
+    data = data.shift(-((window - 1) // 2))
+
+    return data
+
+
 def apply_filters(
     data: pd.DataFrame, avg: bool, clearsky: pd.DataFrame
 ) -> pd.DataFrame:
     data = solar_filter(data, clearsky)
 
     if avg:
-        window = 11
-
-        data = data.rolling(window=window).mean()
-        data = data.shift(-((window - 1) // 2))
+        data = moving_average(data)
 
     return data
 
 
-def generate_gti_ghi_ca(solar_plant: str, avg: bool) -> None:
-    clearsky = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
+def rename_columns(data: pd.DataFrame, type_data: str) -> pd.DataFrame:
+    match (type_data):
+        case "gti":
+            columns = [f"Piranômetro {chr(65 + i)}" for i in range(data.shape[1])]
+        case "ghi":
+            columns = ["GHI"]
+        case "ca_power":
+            columns = ["Potência CA"]
+
+    # Sem alterar o DataFrame recebido, que pode ser compartilhado entre variantes
+    return data.set_axis(columns, axis=1)
+
+
+def generate_variant_days(
+    solar_plant: str,
+    type_data: str,
+    avg: bool,
+    data: pd.DataFrame,
+    clearsky: pd.DataFrame,
+) -> None:
+    log = structlog.get_logger()
+
+    status = "avg" if avg else "original"
+
+    log.info("Gerando variável", var=type_data, AVG=avg)
+
+    path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"{type_data}_{status}"]
+
+    # A média móvel centrada depende das amostras do dia anterior e do seguinte
+    context_days = 1 if avg else 0
+
+    def process(days: pd.DatetimeIndex) -> pd.DataFrame:
+        data_days = select_days(data, days, context_days)
+        data_days = apply_filters(data_days, avg, clearsky)
+
+        return rename_columns(data_days, type_data)
+
+    update_days(path, process, [data, clearsky], context_days)
+
+
+def generate_gti_ghi_ca(
+    solar_plant: str, avg: bool | None = None, incremental: bool = False
+) -> None:
+    clearsky = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
 
     log = structlog.get_logger()
 
+    # Sem "avg", as duas variantes são geradas com uma única leitura dos dados
+    variants = [True, False] if avg is None else [avg]
+
     for type_data in ["gti", "ghi", "ca_power"]:
         data = read_data(solar_plant, type_data)
 
-        status = "avg" if avg else "original"
+        if incremental:
+            for variant in variants:
+                generate_variant_days(solar_plant, type_data, variant, data, clearsky)
+
+            continue
+
+        # O filtro solar é o mesmo nas duas variantes; só a média móvel as diferencia
+        filtered = solar_filter(data, clearsky)
 
-        log.info("Gerando variável", var=type_data, AVG=True if avg else False)
+        for variant in variants:
+            status = "avg" if variant else "original"
 
-        data = apply_filters(data, avg, clearsky)
+            log.info("Gerando variável", var=type_data, AVG=variant)
 
-        match (type_data):
-            case "gti":
-                data.columns = [
-                    f"Piranômetro {chr(65 + i)}" for i in range(data.shape[1])
-                ]
-            case "ghi":
-                data.columns = ["GHI"]
-            case "ca_power":
-                data.columns = ["Potência CA"]
+            path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"{type_data}_{status}"]
 
-        path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"{type_data}_{status}"]
+            output = moving_average(filtered) if variant else filtered
 
-        data.to_parquet(path)
+            save(rename_columns(output, type_data), path)
 
-        log.info("Dados salvos", filename=path)
+            log.info("Dados salvos", filename=path)
@@ -0,0 +1,103 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import structlog
+from src.datastore import datawarehouse_path, read_dataset
+from src.incremental import save
+
+PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
+
+""" Agregados da tabela de perdas exibidos na página de análise das perdas, por
+ângulo: intervalos fixos de CSI e grupos com a mesma quantidade de dias ordenados
+pelo CSI (quantis). O último intervalo inclui o CSI igual a 1 """
+CSI_STEP = 0.1
+QUANTILE = 0.1
+
+
+def summarize(loss_table: pd.DataFrame, groups: list) -> pd.DataFrame:
+    summary = loss_table.groupby(groups, observed=False)["Perda (%)"].agg(
+        ["size", "min", "mean", "max"]
+    )
+
+    return pd.DataFrame(
+        {
+            "Número de dias": summary["size"],
+            "Perda mínima (%)": summary["min"],
+            "Perda média (%)": summary["mean"].round(2),
+            "Perda máxima (%)": summary["max"],
+        }
+    )
+
+
+def get_csi_intervals(loss_table: pd.DataFrame, step: float = CSI_STEP) -> pd.DataFrame:
+    lower = [round(csi, 2) for csi in np.arange(0, 1 - step, step)] + [
+        round(1 - step, 2)
+    ]
+
+    labels = [f"[{csi:.2f}, {csi + step:.2f})" for csi in lower[:-1]] + [
+        f"[{lower[-1]:.2f}, 1.00]"
+    ]
+
+    intervals = pd.cut(
+        loss_table["CSI"],
+        bins=lower + [np.nextafter(1, 2)],
+        right=False,
+        labels=labels,
+    ).rename("Intervalo CSI")
+
+    summary = summarize(loss_table, [loss_table["Angulação (°)"], intervals])
+
+    return summary.reset_index()
+
+
+def get_csi_quantiles(
+    loss_table: pd.DataFrame, quantile: float = QUANTILE
+) -> pd.DataFrame:
+    # Os dias de cada ângulo são ordenados pelo CSI (empates na ordem da tabela) e
+    # divididos em grupos de ceil(dias * quantil) dias
+    angles = loss_table["Angulação (°)"]
+    position = loss_table.groupby(angles)["CSI"].rank(method="first") - 1
+    length = angles.map(angles.value_counts()).mul(quantile).apply(math.ceil)
+
+    group = (position // length).astype(int).rename("Grupo")
+
+    summary = summarize(loss_table, [angles, group])
+
+    csi = loss_table.groupby([angles, group])["CSI"].agg(["min", "max"])
+
+    summary.insert(
+        0,
+        "Intervalo CSI",
+        "["
+        + csi["min"].map("{:.2f}".format)
+        + ", "
+        + csi["max"].map("{:.2f}".format)
+        + "]",
+    )
+
+    return summary.reset_index().drop(columns="Grupo")
+
+
+def generate_loss_aggregates(solar_plant: str) -> None:
+    log = structlog.get_logger()
+
+    log.info("Gerando variável", var="Perdas por intervalo e quantil de CSI")
+
+    loss_table = read_dataset(
+        PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_table"],
+        ["CSI", "Angulação (°)", "Perda (%)"],
+    )
+
+    aggregates = {
+        "loss_csi_interval": get_csi_intervals(loss_table),
+        "loss_csi_quantile": get_csi_quantiles(loss_table),
+    }
+
+    for dataset, aggregate in aggregates.items():
+        path = datawarehouse_path(PLANTS_PARAM[solar_plant]["datawarehouse"], dataset)
+
+        save(aggregate, path)
+
+        log.info("Dados salvos", filename=path)
@@ -1,48 +1,57 @@
 import json
 import os
+from typing import Callable
 
+import numpy as np
 import pandas as pd
 import structlog
-from joblib import Parallel, delayed
+from src.datastore import read_dataset
+from src.equation import compile_equation
+from src.incremental import day_keys, save, select_days, update_days
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
 
-def process_day(
-    unavailability_profile: pd.DataFrame, loss_table: pd.DataFrame, equation: str
-) -> pd.DataFrame | None:
+def get_losses(
+    unavailability_profile: pd.DataFrame,
+    loss_table: pd.DataFrame,
+    equation: Callable[..., np.ndarray],
+) -> pd.DataFrame:
     if loss_table.empty or "CSI" not in loss_table.columns:
-        return
+        return pd.DataFrame(columns=["Data"])
 
-    csi = loss_table["CSI"].iloc[0]
+    # O CSI é o mesmo em todas as linhas de um dia da tabela de perdas
+    day_csi = loss_table.drop_duplicates("Data")[["Data", "CSI"]]
 
-    unavailability_profile = unavailability_profile.sort_values("Ângulo médio (°)")
+    losses = unavailability_profile.merge(day_csi, on="Data", how="inner")
 
-    losses = []
-    for _, row in unavailability_profile.iterrows():
-        angle = row["Ângulo médio (°)"]
-        unavailability_percentage = row["Porcentagem de indisponibilidade (%)"]
+    if losses.empty:
+        return pd.DataFrame(columns=["Data"])
 
-        loss = (
-            eval(equation, {"CSI": csi, "Ângulo": angle})
-            * unavailability_percentage
-            / 100
-        )
+    # Mantém os dias na ordem do perfil, com os ângulos ordenados dentro de cada dia
+    losses["Ordem"] = pd.factorize(losses["Data"])[0]
+    losses = losses.sort_values(["Ordem", "Ângulo médio (°)"], kind="stable")
 
-        losses.append(
-            {
-                "Data": row["Data"],
-                "CSI": csi,
-                "Ângulo médio (°)": angle,
-                "Porcentagem de indisponibilidade (%)": unavailability_percentage,
-                "Perda por indisponibilidade (%)": loss,
-            }
-        )
+    losses["Perda por indisponibilidade (%)"] = (
+        equation(losses["CSI"], losses["Ângulo médio (°)"])
+        * losses["Porcentagem de indisponibilidade (%)"]
+        / 100
+    )
 
-    return pd.DataFrame(losses)
+    return losses[
+        [
+            "Data",
+            "CSI",
+            "Ângulo médio (°)",
+            "Porcentagem de indisponibilidade (%)",
+            "Perda por indisponibilidade (%)",
+        ]
+    ].reset_index(drop=True)
 
 
-def generate_loss_due_to_unavailability(solar_plant: str) -> None:
+def generate_loss_due_to_unavailability(
+    solar_plant: str, incremental: bool = False
+) -> None:
     log = structlog.get_logger()
 
     if not os.path.exists(
@@ -55,32 +64,33 @@ def generate_loss_due_to_unavailability(solar_plant: str) -> None:
 
     log.info("Gerando variável", var="Perda por indisponibilidade (%)")
 
-    unavailability_profile = pd.read_parquet(
+    unavailability_profile = read_dataset(
         PLANTS_PARAM[solar_plant]["datalake"]["unavailability_profile"]
     )
-    loss_table = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_table"]
-    )
+    loss_table = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_table"])
 
     equation = PLANTS_PARAM[solar_plant]["equation"]
-    equation = equation.replace("^", "**")
+    loss_equation = compile_equation(equation)
 
-    date_range = unavailability_profile["Data"].unique()
+    def process(days: pd.DatetimeIndex) -> pd.DataFrame:
+        profile_days = select_days(unavailability_profile, days, day_column="Data")
 
-    loss_list = Parallel(n_jobs=-1)(
-        delayed(process_day)(
-            unavailability_profile[unavailability_profile["Data"] == date],
-            loss_table[loss_table["Data"] == date],
-            equation,
-        )
-        for date in date_range
-    )
-
-    loss_due_to_unavailability = pd.concat(loss_list)
-    loss_due_to_unavailability = loss_due_to_unavailability.reset_index(drop=True)
+        return get_losses(profile_days, loss_table, loss_equation)
 
     path = PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_due_to_unavailability"]
 
-    loss_due_to_unavailability.to_parquet(path)
+    if incremental:
+        update_days(
+            path,
+            process,
+            [unavailability_profile, loss_table],
+            day_column="Data",
+            source_day_column="Data",
+            salt=equation,
+        )
+    else:
+        days = day_keys(unavailability_profile, "Data").unique()
+
+        save(process(days), path)
 
-    log.info("Dados salvos", filename=path)
+        log.info("Dados salvos", filename=path)
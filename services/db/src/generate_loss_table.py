@@ -2,117 +2,141 @@ import json
 
 import pandas as pd
 import structlog
-from joblib import Parallel, delayed
+from src.datastore import read_dataset
+from src.incremental import save, select_days, update_days
+from src.status import AVAILABLE, read_classification
+from src.stopped_trackers_store import (
+    pivot_angles,
+    read_stopped_trackers,
+    stored_day_hashes,
+)
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
 
+def day_sum(data: pd.DataFrame | pd.Series, days: pd.DatetimeIndex):
+    return data.groupby(data.index.normalize()).sum().reindex(days, fill_value=0)
+
+
 def get_csi(
-    ghi: pd.DataFrame,
-    ghi_class: pd.DataFrame,
-    clearsky: pd.DataFrame,
-) -> float | None:
-    # Exclui os dias que o GHI não está disponível
-    if ghi_class["GHI"].ne("Disponível").any():
-        csi = None
-    else:
-        clearsky_only_irradiance = clearsky[clearsky["GHI teórico (clearsky)"] > 0]
-        ghi_limited = ghi.loc[clearsky_only_irradiance.index]
+    ghi: pd.DataFrame, clearsky: pd.DataFrame, days: pd.DatetimeIndex
+) -> pd.Series:
+    clearsky = clearsky["GHI teórico (clearsky)"]
 
-        # Cálculo do índice de céu limpo
-        day_irradiation = ghi_limited["GHI"].sum()
-        teoric_irradiation = clearsky["GHI teórico (clearsky)"].sum()
+    # Irradiação medida apenas nos instantes com irradiância de céu limpo
+    ghi_limited = ghi["GHI"].reindex(clearsky.index[clearsky > 0])
 
-        csi = round(day_irradiation / teoric_irradiation, 2)
+    # Cálculo do índice de céu limpo
+    day_irradiation = day_sum(ghi_limited, days)
+    teoric_irradiation = day_sum(clearsky, days)
 
-        csi = min(csi, 1)
+    csi = (day_irradiation / teoric_irradiation).round(2)
 
-    return csi
+    return csi.clip(upper=1)
 
 
-def get_day_loss(
+def get_loss_table(
     ghi: pd.DataFrame,
     classification: pd.DataFrame,
     clearsky: pd.DataFrame,
     teoric_power: pd.DataFrame,
     stopped_trackers_power: pd.DataFrame,
-) -> pd.DataFrame | None:
-    csi = get_csi(ghi, classification[["GHI"]], clearsky)
-
-    gti_classification = classification.drop("GHI", axis=1)
-
-    """ Verifica se é possível utilizar o índice de céu limpo do dia.
-    Também verifica se o classification possui pelo menos uma coluna "Disponível" em cada uma de suas linhas """
-    if (
-        csi is None
-        or gti_classification.apply(
-            lambda row: "Disponível" not in row.values, axis=1
-        ).any()
-    ):
-        return None
-    else:
-        day_power = teoric_power["Potência teórica GTI"].sum()
-        percentual_loss = round(
-            (day_power - stopped_trackers_power.sum()) / day_power * 100, 2
-        )
+    days: pd.DatetimeIndex,
+) -> pd.DataFrame:
+    days = pd.DatetimeIndex(days).normalize()
+
+    class_days = classification.index.normalize()
+
+    """ Exclui os dias em que o GHI não está disponível e os dias com algum período
+    sem nenhuma coluna "Disponível" no classification """
+    ghi_unavailable = classification["GHI"].ne(AVAILABLE).groupby(class_days).any()
+    gti_unavailable = (
+        classification.drop("GHI", axis=1)
+        .ne(AVAILABLE)
+        .all(axis=1)
+        .groupby(class_days)
+        .any()
+    )
+    unavailable = ghi_unavailable | gti_unavailable
+    valid_days = days[~unavailable.reindex(days, fill_value=False).to_numpy()]
 
-        angle_list = [
-            int(col.split(" ")[-1].split("°")[0])
-            for col in stopped_trackers_power.columns
-        ]
-
-        return pd.DataFrame(
-            {
-                "Data": ghi.index.date[0],
-                "CSI": csi,
-                "Angulação (°)": angle_list,
-                "Perda (%)": percentual_loss.values,
-            }
-        )
+    csi = get_csi(ghi, clearsky, valid_days)
+
+    # As colunas da potência com trackers parados são os ângulos
+    day_power = day_sum(teoric_power["Potência teórica GTI"], valid_days)
+    stopped_power = day_sum(stopped_trackers_power.astype("float64"), valid_days)
+
+    percentual_loss = (
+        stopped_power.rsub(day_power, axis=0).div(day_power, axis=0) * 100
+    ).round(2)
+
+    loss_table = percentual_loss.stack().rename("Perda (%)").reset_index()
+    loss_table.columns = ["Data", "Angulação (°)", "Perda (%)"]
+
+    loss_table.insert(1, "CSI", csi.reindex(loss_table["Data"]).to_numpy())
+    loss_table["Data"] = loss_table["Data"].dt.date
+
+    loss_table = loss_table.sort_values(["Data", "Angulação (°)"])
+
+    return loss_table.reset_index(drop=True)
 
 
-def generate_loss_table(solar_plant: str) -> None:
+def generate_loss_table(solar_plant: str, incremental: bool = False) -> None:
     log = structlog.get_logger()
 
     log.info("Gerando variável", var="Data, CSI, Angulação (°), Perda (%)")
 
-    ghi = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
+    ghi = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
 
-    classification = pd.read_parquet(
+    classification = read_classification(
         PLANTS_PARAM[solar_plant]["datawarehouse"]["classification"]
     )
 
-    clearsky = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
+    clearsky = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"])
 
-    teoric_power = pd.read_parquet(
+    teoric_power = read_dataset(
         PLANTS_PARAM[solar_plant]["datawarehouse"]["teoric_power_avg"]
     )
-    stopped_trackers_power = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"]["stopped_trackers_power"]
-    )
-
-    begin = teoric_power.index.min()
-    end = teoric_power.index.max()
+    stopped_trackers_path = PLANTS_PARAM[solar_plant]["datawarehouse"][
+        "stopped_trackers_power"
+    ]
+
+    def process(date_range: pd.DatetimeIndex) -> pd.DataFrame:
+        # Apenas as partições mensais dos dias processados são lidas
+        stopped_trackers_power = pivot_angles(
+            read_stopped_trackers(
+                stopped_trackers_path,
+                begin=date_range.min(),
+                end=date_range.max() + pd.Timedelta(days=1, seconds=-1),
+            )
+        )
 
-    date_range = pd.date_range(begin, end, freq="D")
+        frames = [ghi, classification, clearsky, teoric_power, stopped_trackers_power]
 
-    loss_list = Parallel(n_jobs=-1)(
-        delayed(get_day_loss)(
-            ghi[ghi.index.date == date.date()],
-            classification[classification.index.date == date.date()],
-            clearsky[clearsky.index.date == date.date()],
-            teoric_power[teoric_power.index.date == date.date()],
-            stopped_trackers_power[stopped_trackers_power.index.date == date.date()],
+        return get_loss_table(
+            *[select_days(frame, date_range) for frame in frames], date_range
         )
-        for date in date_range
-    )
-
-    loss_table = pd.concat(loss_list)
-    loss_table = loss_table.sort_values(["Data", "Angulação (°)"])
-    loss_table = loss_table.reset_index(drop=True)
 
     path = PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_table"]
 
-    loss_table.to_parquet(path)
+    if incremental:
+        clearsky_days = select_days(clearsky, teoric_power.index.normalize().unique())
+
+        # A potência com trackers parados entra pelos hashes diários dos manifestos
+        stopped_trackers_days = stored_day_hashes(stopped_trackers_path)
+
+        update_days(
+            path,
+            process,
+            [ghi, classification, clearsky_days, teoric_power, stopped_trackers_days],
+            day_column="Data",
+        )
+    else:
+        begin = teoric_power.index.min()
+        end = teoric_power.index.max()
+
+        date_range = pd.date_range(begin, end, freq="D")
+
+        save(process(date_range), path)
 
-    log.info("Dados salvos", filename=path)
+        log.info("Dados salvos", filename=path)
@@ -4,45 +4,28 @@ import os
 import pandas as pd
 import pvpowerplants.plant as pvp
 import structlog
+from joblib import Parallel, delayed
+from src import parallel
+from src.datastore import read_dataset
+from src.helio import helio_power
+from src.stopped_trackers_store import remove_angle, stored_angles, write_angle
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
-SU_DATA = json.load(open("pvIFSC/pvpowerplants/plants.json"))
 
 BEGIN_ANGLE = -60
 END_ANGLE = 60
 ANGLE_STEP = 5
 
 
-def generate_helio_power(conditions: pd.DataFrame, angle: int) -> pd.DataFrame:
-    ivp_list = []
-    su_map = {key: value for key, value in SU_DATA["plants"].items() if "SU" in key}
-
-    for su, details in su_map.items():
-        inverter = details["gen_units"][0]["inverter"]
-        n_strings = sum(details["gen_units"][0]["n_strings_per_input"])
-
-        if "?????" not in inverter:
-            fault_tracker = [(n_strings, angle)]
-
-            ivp = pvp.power(
-                plant_config=su,
-                conditions=conditions,
-                fault_tracker=fault_tracker,
-                multiprocess=True,
-            )["total"]
-
-            ivp_list.append(ivp["Pac"])
-
-    ivp = pd.concat(ivp_list, axis=1).sum(axis=1)
-
-    return pd.DataFrame(ivp)
-
-
 def select_power_plant(
-    solar_plant: str, conditions: pd.DataFrame, angle: int
+    solar_plant: str,
+    conditions: pd.DataFrame,
+    angle: int,
+    multiprocess: bool = True,
+    workers: int = 1,
 ) -> pd.DataFrame:
     if solar_plant == "Hélio":
-        ivp = generate_helio_power(conditions, angle)
+        ivp = helio_power(conditions, angle, workers, multiprocess=multiprocess)
     else:
         fault_tracker = [(PLANTS_PARAM[solar_plant]["n_strings"], angle)]
 
@@ -50,7 +33,7 @@ def select_power_plant(
             PLANTS_PARAM[solar_plant]["name"],
             conditions,
             fault_tracker=fault_tracker,
-            multiprocess=True,
+            multiprocess=multiprocess,
         )["total"]
 
         ivp = ivp[["Pac"]]
@@ -60,12 +43,40 @@ def select_power_plant(
     return ivp
 
 
+def angle_list(solar_plant: str) -> list[int]:
+    grid = PLANTS_PARAM[solar_plant].get("angle_grid", {})
+
+    begin = grid.get("begin", BEGIN_ANGLE)
+    end = grid.get("end", END_ANGLE)
+    step = grid.get("step", ANGLE_STEP)
+
+    return list(range(begin, end + step, step))
+
+
+def generate_angle_power(
+    solar_plant: str,
+    conditions: pd.DataFrame,
+    angle: int,
+    multiprocess: bool,
+    workers: int,
+) -> None:
+    log = structlog.get_logger()
+
+    log.info(f"Gerando potência teórica para ângulo {angle}°...")
+
+    ivp = select_power_plant(solar_plant, conditions, angle, multiprocess, workers)
+
+    ivp.index = ivp.index.tz_localize(None)
+
+    path = PLANTS_PARAM[solar_plant]["datawarehouse"]["stopped_trackers_power"]
+
+    write_angle(path, angle, ivp[ivp.columns[0]])
+
+
 def generate_stopped_trackers_power(solar_plant: str) -> None:
-    ghi = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
-    wind_speed = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"]["wind_speed"]
-    )
-    amb_temp = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["amb_temp"])
+    ghi = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["ghi_avg"])
+    wind_speed = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["wind_speed"])
+    amb_temp = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["amb_temp"])
 
     conditions = pd.DataFrame(
         {
@@ -84,29 +95,52 @@ def generate_stopped_trackers_power(solar_plant: str) -> None:
 
     conditions = conditions.set_index(date_range)
 
-    angle_list = list(range(BEGIN_ANGLE, END_ANGLE + ANGLE_STEP, ANGLE_STEP))
+    angles = angle_list(solar_plant)
 
     path = PLANTS_PARAM[solar_plant]["datawarehouse"]["stopped_trackers_power"]
 
-    if os.path.exists(path):
+    # Converte a saída em arquivo único de uma versão anterior da etapa
+    if os.path.isfile(path):
         ivp = pd.read_parquet(path)
-    else:
-        ivp = pd.DataFrame()
+        os.remove(path)
+
+        for angle in angles:
+            if f"Potência teórica {angle}°" in ivp.columns:
+                write_angle(path, angle, ivp[f"Potência teórica {angle}°"])
+
+    os.makedirs(path, exist_ok=True)
 
     log = structlog.get_logger()
 
-    for angle in angle_list:
-        if not f"Potência teórica {angle}°" in ivp.columns:
-            log.info(f"Gerando potência teórica para ângulo {angle}°...")
+    # Ângulos fora da grade são descartados; o cache de simulações os recupera
+    for angle in stored_angles(path):
+        if angle not in angles:
+            remove_angle(path, angle)
 
-            ivp_angle = select_power_plant(solar_plant, conditions, angle)
+    pending = []
+    for angle in angles:
+        if angle in stored_angles(path):
+            log.info(f"Potência teórica para ângulo {angle}° já existe")
+        else:
+            pending.append(angle)
 
-            ivp_angle.index = ivp_angle.index.tz_localize(None)
+    workers, remaining = parallel.split(len(pending))
 
-            ivp = pd.concat([ivp, ivp_angle], axis=1)
+    # Os núcleos que sobram dos ângulos são divididos entre as sub-usinas do Hélio
+    su_workers = remaining if solar_plant == "Hélio" else 1
 
-            ivp.to_parquet(path)
-        else:
-            log.info(f"Potência teórica para ângulo {angle}° já existe")
+    """ Os ângulos são simulados em paralelo, cada um gravando a própria partição.
+    O pool do pvIFSC só é usado quando há um único worker com o orçamento inteiro,
+    evitando processos aninhados disputando os mesmos núcleos """
+    Parallel(n_jobs=workers)(
+        delayed(generate_angle_power)(
+            solar_plant,
+            conditions,
+            angle,
+            workers == 1 and parallel.pool_allowed(),
+            su_workers,
+        )
+        for angle in pending
+    )
 
     log.info("Dados salvos", filename=path)
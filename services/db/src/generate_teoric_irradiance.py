@@ -3,6 +3,11 @@ import json
 import pandas as pd
 import structlog
 from joblib import Parallel, delayed
+from src import parallel
+from src.datastore import read_dataset
+from src.day_partition import split_days
+from src.incremental import save, update_days
+from src.status import AVAILABLE, read_classification
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
@@ -17,7 +22,7 @@ def get_period_irradiances(
     classification_period = classification.loc[begin:end]
 
     classification_period = classification_period.loc[
-        :, (classification_period == "Disponível").all()
+        :, (classification_period == AVAILABLE).all()
     ]
 
     if not classification_period.empty:
@@ -29,13 +34,9 @@ def get_period_irradiances(
 
 
 def process_day(
-    gti: pd.DataFrame,
-    classification: pd.DataFrame,
-    date: pd.Timestamp,
+    gti_day: pd.DataFrame,
+    classification_day: pd.DataFrame,
 ) -> pd.DataFrame | None:
-    gti_day = gti.loc[gti.index.date == date.date()]
-    classification_day = classification.loc[classification.index.date == date.date()]
-
     limits = [
         (gti_day.index.min(), classification_day.index[1] - pd.Timedelta(seconds=1)),
         (classification_day.index[1], gti_day.index.max()),
@@ -56,31 +57,87 @@ def process_day(
         return pd.concat(teoric_irradiances_list)
 
 
-def generate_teoric_irradiance(solar_plant: str, avg: bool) -> None:
-    log = structlog.get_logger()
+def day_tasks(
+    gti: pd.DataFrame, classification: pd.DataFrame, date_range: pd.DatetimeIndex
+) -> list:
+    return [
+        delayed(process_day)(gti_day, classification_day)
+        for gti_day, classification_day in zip(
+            split_days(gti, date_range), split_days(classification, date_range)
+        )
+    ]
+
+
+def concat_days(teoric_irradiance_list: list[pd.DataFrame | None]) -> pd.DataFrame:
+    # Dias sem nenhum sensor disponível não geram irradiância teórica
+    if all(irradiance is None for irradiance in teoric_irradiance_list):
+        return pd.DataFrame(columns=["GTI teórico"])
 
-    status = "avg" if avg else "original"
+    return pd.concat(teoric_irradiance_list)
 
-    log.info("Gerando variável", var="GTI teórico", AVG=True if avg else False)
 
-    gti = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"][f"gti_{status}"])
-    classification = pd.read_parquet(
+def generate_teoric_irradiance(
+    solar_plant: str, avg: bool | None = None, incremental: bool = False
+) -> None:
+    log = structlog.get_logger()
+
+    # Sem "avg", as duas variantes são geradas com uma única leitura da classificação
+    variants = [True, False] if avg is None else [avg]
+
+    classification = read_classification(
         PLANTS_PARAM[solar_plant]["datawarehouse"]["classification"]
     ).drop(columns=["GHI"])
 
-    begin = gti.index.min()
-    end = gti.index.max()
+    gti = {}
+    paths = {}
+    for variant in variants:
+        status = "avg" if variant else "original"
+
+        log.info("Gerando variável", var="GTI teórico", AVG=variant)
+
+        gti[variant] = read_dataset(
+            PLANTS_PARAM[solar_plant]["datawarehouse"][f"gti_{status}"]
+        )
+        paths[variant] = PLANTS_PARAM[solar_plant]["datawarehouse"][
+            f"teoric_irradiance_{status}"
+        ]
+
+    if incremental:
+        for variant in variants:
 
-    date_range = pd.date_range(begin, end, freq="D")
+            def process(date_range: pd.DatetimeIndex, gti=gti[variant]) -> pd.DataFrame:
+                return concat_days(
+                    Parallel(n_jobs=parallel.budget())(
+                        day_tasks(gti, classification, date_range)
+                    )
+                )
 
-    teoric_irradiance_list = Parallel(n_jobs=-1)(
-        delayed(process_day)(gti, classification, date) for date in date_range
+            update_days(paths[variant], process, [gti[variant], classification])
+
+        return
+
+    date_ranges = {
+        variant: pd.date_range(
+            gti[variant].index.min(), gti[variant].index.max(), freq="D"
+        )
+        for variant in variants
+    }
+
+    # Os dias das duas variantes são processados em um único pool
+    teoric_irradiance_list = Parallel(n_jobs=parallel.budget())(
+        task
+        for variant in variants
+        for task in day_tasks(gti[variant], classification, date_ranges[variant])
     )
 
-    teoric_irradiance = pd.concat(teoric_irradiance_list)
+    offset = 0
+    for variant in variants:
+        days = len(date_ranges[variant])
 
-    path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"teoric_irradiance_{status}"]
+        save(
+            concat_days(teoric_irradiance_list[offset : offset + days]), paths[variant]
+        )
 
-    teoric_irradiance.to_parquet(path)
+        log.info("Dados salvos", filename=paths[variant])
 
-    log.info("Dados salvos", filename=path)
+        offset += days
@@ -3,83 +3,108 @@ import json
 import pandas as pd
 import pvpowerplants.plant as pvp
 import structlog
+from src import parallel
+from src.datastore import read_dataset
+from src.helio import SU_DATA, helio_power, sub_units
+from src.incremental import consecutive_days, save, select_days, update_days
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
-SU_DATA = json.load(open("pvIFSC/pvpowerplants/plants.json"))
 
 
-def generate_helio_power(conditions: pd.DataFrame) -> pd.DataFrame:
-    ivp_list = []
-    su_map = {key: value for key, value in SU_DATA["plants"].items() if "SU" in key}
+def simulate_power(solar_plant: str, conditions: pd.DataFrame) -> pd.DataFrame:
+    begin = conditions.index.min()
+    end = conditions.index.max()
 
-    for su, details in su_map.items():
-        inverter = details["gen_units"][0]["inverter"]
+    tz = PLANTS_PARAM[solar_plant]["location"]["tz"]
 
-        if "?????" not in inverter:
-            ivp = pvp.power(
-                plant_config=su,
-                conditions=conditions,
-                irradiance_source="gti",
-                multiprocess=True,
-            )["total"]
+    date_range = pd.date_range(start=begin, end=end, freq="10min", tz=tz)
 
-            ivp_list.append(ivp["Pac"])
+    conditions = conditions.set_index(date_range)
 
-    ivp = pd.concat(ivp_list, axis=1).sum(axis=1)
+    if solar_plant == "Hélio":
+        ivp = helio_power(
+            conditions, workers=parallel.budget(), irradiance_source="gti"
+        )
+    else:
+        ivp = pvp.power(
+            PLANTS_PARAM[solar_plant]["name"],
+            conditions,
+            irradiance_source="gti",
+            multiprocess=parallel.pool_allowed(),
+        )["total"]
 
-    return pd.DataFrame(ivp)
+        ivp = ivp[["Pac"]]
 
+    ivp = ivp.rename(columns={ivp.columns[0]: "Potência teórica GTI"})
 
-def generate_teoric_power(solar_plant: str, avg: bool) -> None:
-    log = structlog.get_logger()
+    ivp.index = ivp.index.tz_localize(None)
 
-    sufix = "avg" if avg else "original"
+    return ivp
 
-    log.info("Gerando variável", var="Potência teórica GTI", AVG=True if avg else False)
 
-    teoric_irradiance = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"][f"teoric_irradiance_{sufix}"]
-    )
-    wind_speed = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"]["wind_speed"]
-    )
-    amb_temp = pd.read_parquet(PLANTS_PARAM[solar_plant]["datawarehouse"]["amb_temp"])
+def simulation_salt(solar_plant: str) -> str:
+    # Configurações do pvIFSC e parâmetros da usina que afetam a simulação de cada dia
+    name = PLANTS_PARAM[solar_plant]["name"]
 
-    conditions = pd.DataFrame(
+    if solar_plant == "Hélio":
+        config = {su: SU_DATA["plants"][su] for su in sub_units()}
+    else:
+        config = SU_DATA["plants"].get(name, name)
+
+    return json.dumps(
         {
-            "gti": teoric_irradiance[teoric_irradiance.columns[0]],
-            "wind_speed": wind_speed[wind_speed.columns[0]],
-            "air_temp": amb_temp[amb_temp.columns[0]],
-        }
+            "name": name,
+            "location": PLANTS_PARAM[solar_plant]["location"],
+            "config": config,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
     )
 
-    begin = teoric_irradiance.index.min()
-    end = teoric_irradiance.index.max()
 
-    tz = PLANTS_PARAM[solar_plant]["location"]["tz"]
+def generate_teoric_power(
+    solar_plant: str, avg: bool | None = None, incremental: bool = False
+) -> None:
+    log = structlog.get_logger()
 
-    date_range = pd.date_range(start=begin, end=end, freq="10min", tz=tz)
+    # Sem "avg", as duas variantes compartilham a leitura do vento e da temperatura
+    variants = [True, False] if avg is None else [avg]
 
-    conditions = conditions.set_index(date_range)
+    wind_speed = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["wind_speed"])
+    amb_temp = read_dataset(PLANTS_PARAM[solar_plant]["datawarehouse"]["amb_temp"])
 
-    if solar_plant == "Hélio":
-        ivp = generate_helio_power(conditions)
-    else:
-        ivp = pvp.power(
-            PLANTS_PARAM[solar_plant]["name"],
-            conditions,
-            irradiance_source="gti",
-            multiprocess=True,
-        )["total"]
+    for variant in variants:
+        sufix = "avg" if variant else "original"
 
-        ivp = ivp[["Pac"]]
+        log.info("Gerando variável", var="Potência teórica GTI", AVG=variant)
 
-    ivp = ivp.rename(columns={ivp.columns[0]: "Potência teórica GTI"})
+        teoric_irradiance = read_dataset(
+            PLANTS_PARAM[solar_plant]["datawarehouse"][f"teoric_irradiance_{sufix}"]
+        )
 
-    ivp.index = ivp.index.tz_localize(None)
+        conditions = pd.DataFrame(
+            {
+                "gti": teoric_irradiance[teoric_irradiance.columns[0]],
+                "wind_speed": wind_speed[wind_speed.columns[0]],
+                "air_temp": amb_temp[amb_temp.columns[0]],
+            }
+        )
+
+        path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"teoric_power_{sufix}"]
+
+        if incremental:
 
-    path = PLANTS_PARAM[solar_plant]["datawarehouse"][f"teoric_power_{sufix}"]
+            def process(days: pd.DatetimeIndex, conditions=conditions) -> pd.DataFrame:
+                # Cada sequência de dias consecutivos é simulada com um índice contínuo
+                return pd.concat(
+                    [
+                        simulate_power(solar_plant, select_days(conditions, run))
+                        for run in consecutive_days(days)
+                    ]
+                )
 
-    ivp.to_parquet(path)
+            update_days(path, process, [conditions], salt=simulation_salt(solar_plant))
+        else:
+            save(simulate_power(solar_plant, conditions), path)
 
-    log.info("Dados salvos", filename=path)
+            log.info("Dados salvos", filename=path)
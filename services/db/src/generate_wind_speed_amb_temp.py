@@ -2,12 +2,14 @@ import json
 
 import pandas as pd
 import structlog
+from src.datastore import read_dataset
+from src.incremental import save, select_days, update_days
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 
 
 def process_data(solar_plant: str, type_data: str) -> pd.DataFrame:
-    data = pd.read_parquet(PLANTS_PARAM[solar_plant]["datalake"][type_data])
+    data = read_dataset(PLANTS_PARAM[solar_plant]["datalake"][type_data])
 
     data = data.set_index("timestamp")
     data.index = pd.to_datetime(data.index)
@@ -21,7 +23,7 @@ def process_data(solar_plant: str, type_data: str) -> pd.DataFrame:
     return data
 
 
-def generate_wind_speed_amb_temp(solar_plant: str) -> None:
+def generate_wind_speed_amb_temp(solar_plant: str, incremental: bool = False) -> None:
     log = structlog.get_logger()
 
     for type_data in ["wind_speed", "amb_temp"]:
@@ -31,6 +33,9 @@ def generate_wind_speed_amb_temp(solar_plant: str) -> None:
 
         path = PLANTS_PARAM[solar_plant]["datawarehouse"][type_data]
 
-        data.to_parquet(path)
+        if incremental:
+            update_days(path, lambda days: select_days(data, days), [data])
+        else:
+            save(data, path)
 
-        log.info("Dados salvos", filename=path)
+            log.info("Dados salvos", filename=path)
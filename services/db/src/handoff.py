@@ -0,0 +1,83 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+""" Cópias em Arrow IPC, sem compressão, das saídas escritas durante uma execução
+do pipeline. As etapas seguintes as leem com memory map, sem descompactar o
+parquet novamente. Os arquivos ficam em um diretório temporário removido ao final
+da execução, e o parquet continua sendo a versão publicada no datawarehouse.
+Cada cópia guarda o mtime e o tamanho do parquet de origem e é ignorada quando
+ele muda, o que permite compartilhar o diretório entre processos """
+STATE: dict = {"directory": None}
+SOURCE_KEY = b"handoff_source"
+
+
+def enable() -> str:
+    if STATE["directory"] is None:
+        STATE["directory"] = tempfile.mkdtemp(prefix="handoff-")
+
+    return STATE["directory"]
+
+
+def use(directory: str | None) -> None:
+    # Processos filhos passam a ler e escrever no diretório do processo principal
+    STATE["directory"] = directory
+
+
+def disable() -> None:
+    if STATE["directory"] is not None:
+        shutil.rmtree(STATE["directory"], ignore_errors=True)
+
+    STATE["directory"] = None
+
+
+def arrow_path(path: str) -> str:
+    digest = hashlib.sha1(os.path.normpath(path).encode()).hexdigest()
+
+    return os.path.join(STATE["directory"], f"{digest}.arrow")
+
+
+def source(path: str) -> bytes | None:
+    # Saídas particionadas (modo incremental) não têm cópia em Arrow IPC
+    if not os.path.isfile(path):
+        return None
+
+    stat = os.stat(path)
+
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+
+def write_arrow(data: pd.DataFrame, path: str) -> None:
+    if STATE["directory"] is None:
+        return
+
+    table = pa.Table.from_pandas(data, preserve_index=True)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, SOURCE_KEY: source(path)}
+    )
+
+    # Escrita atômica, já que outros processos podem estar lendo a cópia anterior
+    tmp_path = f"{arrow_path(path)}.{os.getpid()}.tmp"
+
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    os.replace(tmp_path, arrow_path(path))
+
+
+def read_arrow(path: str) -> pd.DataFrame | None:
+    if STATE["directory"] is None or not os.path.exists(arrow_path(path)):
+        return None
+
+    # Os buffers da tabela apontam para o arquivo mapeado, sem cópia na leitura
+    reader = pa.ipc.open_file(pa.memory_map(arrow_path(path)))
+
+    if reader.schema.metadata.get(SOURCE_KEY) != source(path):
+        return None
+
+    return reader.read_all().to_pandas(split_blocks=True)
@@ -0,0 +1,62 @@
+import json
+import time
+
+import pandas as pd
+import pvpowerplants.plant as pvp
+import structlog
+from joblib import Parallel, delayed
+from src import parallel
+
+SU_DATA = json.load(open("pvIFSC/pvpowerplants/plants.json"))
+
+
+def sub_units() -> dict[str, int]:
+    # Sub-usinas com inversor conhecido e o respectivo número de strings
+    return {
+        su: sum(details["gen_units"][0]["n_strings_per_input"])
+        for su, details in SU_DATA["plants"].items()
+        if "SU" in su and "?????" not in details["gen_units"][0]["inverter"]
+    }
+
+
+def simulate_sub_unit(
+    su: str, conditions: pd.DataFrame, **kwargs
+) -> tuple[str, pd.Series, float]:
+    begin = time.perf_counter()
+
+    ivp = pvp.power(plant_config=su, conditions=conditions, **kwargs)["total"]
+
+    return su, ivp["Pac"], time.perf_counter() - begin
+
+
+def helio_power(
+    conditions: pd.DataFrame,
+    angle: int | None = None,
+    workers: int = 1,
+    **kwargs,
+) -> pd.DataFrame:
+    log = structlog.get_logger()
+
+    # O pool do pvIFSC só é usado quando as sub-usinas rodam em sequência e com o
+    # orçamento inteiro de workers
+    kwargs["multiprocess"] = (
+        kwargs.get("multiprocess", True) and workers == 1 and parallel.pool_allowed()
+    )
+
+    tasks = []
+    for su, n_strings in sub_units().items():
+        if angle is not None:
+            kwargs = {**kwargs, "fault_tracker": [(n_strings, angle)]}
+
+        tasks.append(delayed(simulate_sub_unit)(su, conditions, **kwargs))
+
+    """ Os resultados são somados conforme chegam, sem manter a série de cada
+    sub-usina em memória. A ordem de chegada é a mesma das sub-usinas, para que
+    a soma seja reproduzível entre execuções """
+    ivp = None
+    for su, pac, elapsed in Parallel(n_jobs=workers, return_as="generator")(tasks):
+        log.info("Sub-usina simulada", su=su, angle=angle, seconds=round(elapsed, 2))
+
+        ivp = pac if ivp is None else ivp.add(pac, fill_value=0)
+
+    return pd.DataFrame(ivp.fillna(0))
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import structlog
+from src import handoff
+from src.storage import apply_dtype, storage_profile, write_parquet
+
+MANIFEST_FILENAME = "_days.json"
+
+
+def day_keys(data: pd.DataFrame, day_column: str | None = None) -> pd.DatetimeIndex:
+    if day_column is None:
+        return pd.DatetimeIndex(data.index).normalize()
+
+    return pd.DatetimeIndex(pd.to_datetime(data[day_column])).normalize()
+
+
+def select_days(
+    data: pd.DataFrame,
+    days: pd.DatetimeIndex,
+    context_days: int = 0,
+    day_column: str | None = None,
+) -> pd.DataFrame:
+    days = pd.DatetimeIndex(days)
+
+    # Inclui os dias vizinhos necessários para janelas que atravessam a meia-noite
+    for offset in range(1, context_days + 1):
+        days = days.union(days + pd.Timedelta(days=offset))
+        days = days.union(days - pd.Timedelta(days=offset))
+
+    return data[day_keys(data, day_column).isin(days)]
+
+
+def consecutive_days(days: pd.DatetimeIndex) -> list[pd.DatetimeIndex]:
+    days = pd.DatetimeIndex(days).sort_values()
+
+    runs = (days.to_series().diff() != pd.Timedelta(days=1)).cumsum()
+
+    return [days[runs.to_numpy() == run] for run in runs.unique()]
+
+
+def save(data: pd.DataFrame, path: str) -> None:
+    # Remove o dataset particionado de uma execução incremental anterior
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+    profile = storage_profile(path)
+
+    write_parquet(data, path, profile)
+
+    handoff.write_arrow(apply_dtype(data, profile), path)
+
+
+def manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST_FILENAME)
+
+
+def load_manifest(path: str) -> dict[str, str]:
+    if not os.path.exists(manifest_path(path)):
+        return {}
+
+    with open(manifest_path(path)) as file:
+        return json.load(file)
+
+
+def save_manifest(path: str, manifest: dict[str, str]) -> None:
+    with open(f"{manifest_path(path)}.tmp", "w") as file:
+        json.dump(dict(sorted(manifest.items())), file, indent=4)
+
+    os.replace(f"{manifest_path(path)}.tmp", manifest_path(path))
+
+
+def day_hashes(
+    sources: list[pd.DataFrame], day_column: str | None = None, salt: str = ""
+) -> dict[str, str]:
+    digests = {}
+
+    for source in sources:
+        if len(source) == 0:
+            continue
+
+        rows = pd.util.hash_pandas_object(source, index=day_column is None).to_numpy()
+        columns = ",".join(map(str, source.columns)).encode()
+
+        keys = day_keys(source, day_column).to_numpy()
+        order = np.argsort(keys, kind="stable")
+
+        days, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        for day, start, end in zip(days, starts, ends):
+            day = pd.Timestamp(day).strftime("%Y-%m-%d")
+
+            if day not in digests:
+                digests[day] = hashlib.sha256(salt.encode())
+
+            digests[day].update(columns)
+            digests[day].update(rows[order[start:end]].tobytes())
+
+    return {day: digest.hexdigest() for day, digest in sorted(digests.items())}
+
+
+def write_days(
+    path: str,
+    data: pd.DataFrame,
+    days: pd.DatetimeIndex,
+    day_column: str | None = None,
+) -> None:
+    # Substitui a saída em arquivo único de uma execução completa anterior
+    if os.path.isfile(path):
+        os.remove(path)
+
+    os.makedirs(path, exist_ok=True)
+
+    data_keys = None if data.empty else day_keys(data, day_column)
+
+    for month in days.to_period("M").unique():
+        month_days = days[days.to_period("M") == month]
+        filename = os.path.join(path, f"{month}.parquet")
+
+        parts = [] if data_keys is None else [data[data_keys.isin(month_days)]]
+
+        if os.path.exists(filename):
+            stored = pd.read_parquet(filename)
+            parts.append(stored[~day_keys(stored, day_column).isin(month_days)])
+
+        parts = [part for part in parts if not part.empty]
+
+        if not parts:
+            if os.path.exists(filename):
+                os.remove(filename)
+            continue
+
+        merged = pd.concat(parts)
+
+        if day_column is None:
+            merged = merged.sort_index()
+        else:
+            merged = merged.sort_values(day_column, kind="stable")
+            merged = merged.reset_index(drop=True)
+
+        write_parquet(merged, filename, storage_profile(path))
+
+
+def update_days(
+    path: str,
+    process: Callable[[pd.DatetimeIndex], pd.DataFrame],
+    sources: list[pd.DataFrame],
+    context_days: int = 0,
+    day_column: str | None = None,
+    source_day_column: str | None = None,
+    salt: str = "",
+) -> None:
+    log = structlog.get_logger()
+
+    hashes = day_hashes(sources, source_day_column, salt)
+    manifest = load_manifest(path) if os.path.isdir(path) else {}
+
+    changed = pd.DatetimeIndex(
+        [day for day, digest in hashes.items() if manifest.get(day) != digest]
+    )
+
+    # Um dia alterado também invalida os vizinhos que dependem dele
+    available = pd.DatetimeIndex(list(hashes.keys()))
+    pending = select_days(
+        pd.DataFrame(index=available), changed, context_days
+    ).index.sort_values()
+
+    removed = pd.DatetimeIndex(
+        [day for day in manifest.keys() if day not in hashes.keys()]
+    )
+
+    if pending.empty and removed.empty:
+        log.info("Nenhum dia novo ou alterado", filename=path)
+        return
+
+    log.info(
+        "Processando dias pendentes",
+        filename=path,
+        days=len(pending),
+        removed=len(removed),
+    )
+
+    data = pd.DataFrame() if pending.empty else process(pending)
+
+    write_days(path, data, pending.union(removed), day_column)
+
+    pending = pending.strftime("%Y-%m-%d")
+
+    manifest = {day: digest for day, digest in manifest.items() if day in hashes}
+    manifest.update({day: hashes[day] for day in pending})
+
+    save_manifest(path, manifest)
+
+    log.info("Dados salvos", filename=path)
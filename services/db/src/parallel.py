@@ -0,0 +1,27 @@
+import os
+
+""" Orçamento global de workers do pipeline. O total vem da variável de ambiente
+DB_WORKERS (padrão: todos os núcleos). Cada etapa executada em paralelo recebe uma
+fração do orçamento pela mesma variável, e os pools aninhados (joblib e pvIFSC) são
+dimensionados a partir dela em vez de ocuparem todos os núcleos """
+WORKERS_ENV = "DB_WORKERS"
+
+
+def budget() -> int:
+    return max(int(os.environ.get(WORKERS_ENV, os.cpu_count())), 1)
+
+
+def set_budget(workers: int) -> None:
+    os.environ[WORKERS_ENV] = str(max(workers, 1))
+
+
+def split(tasks: int) -> tuple[int, int]:
+    # Tarefas simultâneas e workers que sobram para os pools de cada uma
+    workers = min(budget(), max(tasks, 1))
+
+    return workers, max(budget() // workers, 1)
+
+
+def pool_allowed() -> bool:
+    # O pool do pvIFSC ocupa todos os núcleos, então só é usado com o orçamento inteiro
+    return budget() >= os.cpu_count()
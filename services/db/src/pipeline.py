@@ -0,0 +1,513 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from graphlib import TopologicalSorter
+from typing import Callable
+
+import structlog
+from joblib.externals.loky import get_reusable_executor
+from src import datastore, handoff, parallel
+from src.generate_classification import generate_classification
+from src.generate_clearsky import generate_clearsky
+from src.generate_gti_ghi_ca import generate_gti_ghi_ca
+from src.generate_loss_aggregates import generate_loss_aggregates
+from src.generate_loss_due_to_unavailability import generate_loss_due_to_unavailability
+from src.generate_loss_table import generate_loss_table
+from src.generate_stopped_trackers_power import generate_stopped_trackers_power
+from src.generate_teoric_irradiance import generate_teoric_irradiance
+from src.generate_teoric_power import generate_teoric_power
+from src.generate_wind_speed_amb_temp import generate_wind_speed_amb_temp
+
+PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
+SU_DATA_PATH = "pvIFSC/pvpowerplants/plants.json"
+
+STATE_FILENAME = ".pipeline_state.json"
+STATUSES = ["avg", "original"]
+HASH_CHUNK_SIZE = 1 << 20
+
+# Usina das etapas executadas por um processo do pool (--jobs > 1)
+WORKER_STATE: dict = {"plant": None}
+
+""" Cada etapa declara suas entradas e saídas como pares (seção, chave) de
+"solar_plants.json" ou caminhos fixos, e os parâmetros da usina que a afetam.
+As dependências entre etapas são inferidas a partir desses arquivos. Etapas
+com "incremental" processam apenas os dias novos ou alterados quando o modo
+incremental está ativo """
+STAGES = {
+    "clearsky": {
+        "run": generate_clearsky,
+        "inputs": [("datalake", "ghi")],
+        "outputs": [("datawarehouse", "clearsky")],
+        "params": ["location"],
+        "incremental": True,
+    },
+    # As variantes com e sem média móvel são geradas em uma única passada
+    "gti_ghi_ca": {
+        "run": generate_gti_ghi_ca,
+        "inputs": [
+            ("datalake", "gti"),
+            ("datalake", "ghi"),
+            ("datalake", "ca_power"),
+            ("datawarehouse", "clearsky"),
+        ],
+        "outputs": [
+            ("datawarehouse", f"{type_data}_{status}")
+            for type_data in ["gti", "ghi", "ca_power"]
+            for status in STATUSES
+        ],
+        "params": [],
+        "incremental": True,
+    },
+    "wind_speed_amb_temp": {
+        "run": generate_wind_speed_amb_temp,
+        "inputs": [("datalake", "wind_speed"), ("datalake", "amb_temp")],
+        "outputs": [("datawarehouse", "wind_speed"), ("datawarehouse", "amb_temp")],
+        "params": [],
+        "incremental": True,
+    },
+    "classification": {
+        "run": generate_classification,
+        "inputs": [
+            ("datawarehouse", "gti_avg"),
+            ("datawarehouse", "ghi_avg"),
+            ("datawarehouse", "clearsky"),
+        ],
+        "outputs": [("datawarehouse", "classification")],
+        "params": [],
+        "incremental": True,
+    },
+    "teoric_irradiance": {
+        "run": generate_teoric_irradiance,
+        "inputs": [
+            *[("datawarehouse", f"gti_{status}") for status in STATUSES],
+            ("datawarehouse", "classification"),
+        ],
+        "outputs": [
+            ("datawarehouse", f"teoric_irradiance_{status}") for status in STATUSES
+        ],
+        "params": [],
+        "incremental": True,
+    },
+    "teoric_power": {
+        "run": generate_teoric_power,
+        "inputs": [
+            *[("datawarehouse", f"teoric_irradiance_{status}") for status in STATUSES],
+            ("datawarehouse", "wind_speed"),
+            ("datawarehouse", "amb_temp"),
+            SU_DATA_PATH,
+        ],
+        "outputs": [("datawarehouse", f"teoric_power_{status}") for status in STATUSES],
+        "params": ["name", "location"],
+        "incremental": True,
+    },
+    "stopped_trackers_power": {
+        "run": generate_stopped_trackers_power,
+        "inputs": [
+            ("datawarehouse", "ghi_avg"),
+            ("datawarehouse", "wind_speed"),
+            ("datawarehouse", "amb_temp"),
+            SU_DATA_PATH,
+        ],
+        "outputs": [("datawarehouse", "stopped_trackers_power")],
+        "params": ["name", "n_strings", "location"],
+        # A etapa retoma a partir das partições de cada ângulo, que precisam ser
+        # descartadas quando as entradas mudam. Alterar a grade de ângulos apenas
+        # executa a etapa novamente, reaproveitando os ângulos já simulados
+        "resumable": True,
+        "resume_params": ["angle_grid"],
+    },
+    "loss_table": {
+        "run": generate_loss_table,
+        "inputs": [
+            ("datawarehouse", "ghi_avg"),
+            ("datawarehouse", "classification"),
+            ("datawarehouse", "clearsky"),
+            ("datawarehouse", "teoric_power_avg"),
+            ("datawarehouse", "stopped_trackers_power"),
+        ],
+        "outputs": [("datawarehouse", "loss_table")],
+        "params": [],
+        "incremental": True,
+    },
+    "loss_aggregates": {
+        "run": generate_loss_aggregates,
+        "inputs": [("datawarehouse", "loss_table")],
+        "outputs": [
+            ("datawarehouse", "loss_csi_interval"),
+            ("datawarehouse", "loss_csi_quantile"),
+        ],
+        "params": [],
+        "incremental": False,
+    },
+    "loss_due_to_unavailability": {
+        "run": generate_loss_due_to_unavailability,
+        "inputs": [
+            ("datalake", "unavailability_profile"),
+            ("datawarehouse", "loss_table"),
+        ],
+        "outputs": [("datawarehouse", "loss_due_to_unavailability")],
+        "params": ["equation"],
+        "incremental": True,
+    },
+}
+
+
+def resolve_path(solar_plant: str, entry: tuple | str) -> str:
+    if isinstance(entry, str):
+        return entry
+
+    section, key = entry
+
+    if section == "datawarehouse":
+        return datastore.datawarehouse_path(PLANTS_PARAM[solar_plant][section], key)
+
+    return PLANTS_PARAM[solar_plant][section][key]
+
+
+def stage_graph() -> dict[str, set[str]]:
+    producers = {
+        entry: name for name, stage in STAGES.items() for entry in stage["outputs"]
+    }
+
+    return {
+        name: {producers[entry] for entry in stage["inputs"] if entry in producers}
+        for name, stage in STAGES.items()
+    }
+
+
+def stage_order() -> list[str]:
+    return list(TopologicalSorter(stage_graph()).static_order())
+
+
+def state_path(solar_plant: str) -> str:
+    datawarehouse = os.path.dirname(
+        PLANTS_PARAM[solar_plant]["datawarehouse"]["clearsky"]
+    )
+
+    return os.path.join(datawarehouse, STATE_FILENAME)
+
+
+def load_state(solar_plant: str) -> dict:
+    path = state_path(solar_plant)
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(solar_plant: str, state: dict) -> None:
+    path = state_path(solar_plant)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Escrita atômica para não corromper o estado caso a execução seja interrompida
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(state, file, indent=4, ensure_ascii=False)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def fingerprint(path: str, previous: dict | None) -> dict | None:
+    if not os.path.exists(path):
+        return None
+
+    previous_files = (previous or {}).get("files", {})
+
+    files = {}
+    for file_path in datastore.list_files(path):
+        stat = os.stat(file_path)
+
+        file_fingerprint = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+        old = previous_files.get(file_path)
+
+        # O hash do conteúdo só é recalculado quando mtime ou tamanho mudam
+        if old is not None and all(old[k] == v for k, v in file_fingerprint.items()):
+            file_fingerprint["sha256"] = old["sha256"]
+        else:
+            file_fingerprint["sha256"] = hash_file(file_path)
+
+        files[file_path] = file_fingerprint
+
+    digest = hashlib.sha256()
+    for file_path, file_fingerprint in files.items():
+        digest.update(os.path.relpath(file_path, path).encode())
+        digest.update(file_fingerprint["sha256"].encode())
+
+    return {"sha256": digest.hexdigest(), "files": files}
+
+
+def params_hash(solar_plant: str, params: list[str]) -> str:
+    values = {param: PLANTS_PARAM[solar_plant].get(param) for param in params}
+
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def stage_fingerprint(solar_plant: str, name: str, record: dict | None) -> dict:
+    stage = STAGES[name]
+    previous = (record or {}).get("inputs", {})
+
+    inputs = {}
+    for entry in stage["inputs"]:
+        path = resolve_path(solar_plant, entry)
+        inputs[path] = fingerprint(path, previous.get(path))
+
+    current = {"inputs": inputs, "params": params_hash(solar_plant, stage["params"])}
+
+    if "resume_params" in stage:
+        current["resume_params"] = params_hash(solar_plant, stage["resume_params"])
+
+    return current
+
+
+def changed(current: dict, record: dict) -> bool:
+    if current["params"] != record.get("params"):
+        return True
+
+    recorded_inputs = record.get("inputs", {})
+
+    return any(
+        (fp or {}).get("sha256") != (recorded_inputs.get(path) or {}).get("sha256")
+        for path, fp in current["inputs"].items()
+    )
+
+
+def remove_outputs(solar_plant: str, name: str) -> None:
+    for entry in STAGES[name]["outputs"]:
+        path = resolve_path(solar_plant, entry)
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def plan_stage(
+    solar_plant: str, name: str, state: dict, force: bool, incremental: bool
+) -> dict | None:
+    log = structlog.get_logger()
+
+    record = state.get(name)
+    current = stage_fingerprint(solar_plant, name, record)
+
+    outputs = [resolve_path(solar_plant, entry) for entry in STAGES[name]["outputs"]]
+    missing_outputs = not all(os.path.exists(path) for path in outputs)
+
+    inputs_changed = record is not None and changed(current, record)
+    resume_changed = record is not None and current.get("resume_params") != record.get(
+        "resume_params"
+    )
+
+    if not (
+        force or record is None or missing_outputs or inputs_changed or resume_changed
+    ):
+        log.info("Etapa atualizada, ignorando", plant=solar_plant, stage=name)
+        return None
+
+    incremental = incremental and STAGES[name].get("incremental", False)
+
+    if STAGES[name].get("resumable") and (force or inputs_changed):
+        remove_outputs(solar_plant, name)
+
+    # Forçar uma etapa incremental reprocessa todos os dias
+    if incremental and force:
+        remove_outputs(solar_plant, name)
+
+    return {"current": current, "incremental": incremental}
+
+
+def execute_stage(
+    solar_plant: str,
+    name: str,
+    incremental: bool,
+    workers: int,
+    handoff_dir: str | None,
+) -> None:
+    log = structlog.get_logger()
+
+    # Os pools aninhados da etapa respeitam a fração do orçamento recebida
+    parallel.set_budget(workers)
+    handoff.use(handoff_dir)
+
+    log.info(
+        "Executando etapa",
+        plant=solar_plant,
+        stage=name,
+        incremental=incremental,
+        workers=workers,
+    )
+
+    if incremental:
+        STAGES[name]["run"](solar_plant, incremental=True)
+    else:
+        STAGES[name]["run"](solar_plant)
+
+
+def execute_stage_in_worker(solar_plant: str, *args) -> None:
+    # O processo do pool é reaproveitado entre etapas. As colunas lidas ficam em cache
+    # enquanto ele executar etapas da mesma usina, como no modo sequencial, e são
+    # descartadas quando recebe uma etapa de outra usina
+    if WORKER_STATE["plant"] != solar_plant:
+        datastore.clear()
+        WORKER_STATE["plant"] = solar_plant
+
+    execute_stage(solar_plant, *args)
+
+
+def record_stage(solar_plant: str, name: str, state: dict, current: dict) -> None:
+    outputs = [resolve_path(solar_plant, entry) for entry in STAGES[name]["outputs"]]
+
+    # Etapas que não geraram todas as saídas são executadas novamente na próxima vez
+    if all(os.path.exists(path) for path in outputs):
+        state[name] = current
+    else:
+        state.pop(name, None)
+
+    save_state(solar_plant, state)
+
+
+def submit(executor: Executor | None, function: Callable, *args) -> Future:
+    # Sem executor (uma etapa por vez), a etapa roda no próprio processo
+    if executor is not None:
+        return executor.submit(function, *args)
+
+    future = Future()
+    future.set_result(function(*args))
+
+    return future
+
+
+def run_plants(
+    plants: list[str],
+    selected: set[str],
+    force: bool,
+    incremental: bool,
+    jobs: int,
+    handoff_dir: str | None,
+) -> dict[str, list[str]]:
+    states = {solar_plant: load_state(solar_plant) for solar_plant in plants}
+    executed = {solar_plant: [] for solar_plant in plants}
+
+    graph = stage_graph()
+    sorters = {solar_plant: TopologicalSorter(graph) for solar_plant in plants}
+    for sorter in sorters.values():
+        sorter.prepare()
+
+    workers = max(parallel.budget() // jobs, 1)
+
+    """ Etapas sem dependências pendentes, de qualquer usina, entram na fila assim
+    que ficam prontas e são enviadas ao pool, no máximo "jobs" por vez. O estado de
+    cada usina é atualizado apenas neste processo, à medida que as etapas terminam """
+    executor = None
+    if jobs > 1:
+        # O executor do loky (o mesmo usado pelo joblib) permite que as etapas abram
+        # os próprios pools do joblib dentro dos processos
+        executor = get_reusable_executor(jobs)
+
+    queue = []
+    running = {}
+
+    try:
+        while any(sorter.is_active() for sorter in sorters.values()):
+            for solar_plant, sorter in sorters.items():
+                queue.extend((solar_plant, name) for name in sorter.get_ready())
+
+            while queue and len(running) < jobs:
+                solar_plant, name = queue.pop(0)
+
+                plan = None
+                if name in selected:
+                    plan = plan_stage(
+                        solar_plant, name, states[solar_plant], force, incremental
+                    )
+
+                if plan is None:
+                    sorters[solar_plant].done(name)
+                    continue
+
+                function = execute_stage
+                if executor is not None:
+                    function = execute_stage_in_worker
+
+                future = submit(
+                    executor,
+                    function,
+                    solar_plant,
+                    name,
+                    plan["incremental"],
+                    workers,
+                    handoff_dir,
+                )
+                running[future] = (solar_plant, name, plan["current"])
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                solar_plant, name, current = running.pop(future)
+
+                future.result()
+
+                record_stage(solar_plant, name, states[solar_plant], current)
+                executed[solar_plant].append(name)
+                sorters[solar_plant].done(name)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return executed
+
+
+def run_pipeline(
+    plants: list[str] | None = None,
+    stages: list[str] | None = None,
+    force: bool = False,
+    incremental: bool = False,
+    arrow_handoff: bool = False,
+    jobs: int = 1,
+) -> None:
+    log = structlog.get_logger()
+
+    plants = plants or list(PLANTS_PARAM.keys())
+    selected = set(stages or STAGES.keys())
+
+    # Com uma etapa por vez, as usinas são processadas em sequência, como antes
+    groups = [[solar_plant] for solar_plant in plants] if jobs == 1 else [plants]
+
+    for group in groups:
+        for solar_plant in group:
+            log.info(f"Populando os dados da usina {solar_plant}...\n")
+
+        handoff_dir = handoff.enable() if arrow_handoff else None
+
+        try:
+            executed = run_plants(
+                group, selected, force, incremental, jobs, handoff_dir
+            )
+        finally:
+            # As colunas lidas e as cópias em Arrow IPC valem apenas para as usinas atuais
+            datastore.clear()
+            handoff.disable()
+
+        for solar_plant, stages_executed in executed.items():
+            log.info("Etapas executadas", plant=solar_plant, stages=stages_executed)
+
+        print("\n")
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from src.datastore import read_dataset
+
+AVAILABLE = "Disponível"
+STOW = "Stow"
+UNAVAILABLE = "Indisponível"
+
+""" Categorias fixas da classificação dos sensores. No parquet, as colunas são
+salvas como códigos int8 com dicionário, e as comparações usam os códigos """
+STATUS = pd.CategoricalDtype([AVAILABLE, STOW, UNAVAILABLE])
+
+
+def status_code(status: str) -> np.int8:
+    return np.int8(STATUS.categories.get_loc(status))
+
+
+def from_codes(codes: np.ndarray, columns: list, index: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            column: pd.Categorical.from_codes(codes[:, i], dtype=STATUS)
+            for i, column in enumerate(columns)
+        },
+        index=index,
+    )
+
+
+def read_classification(path: str) -> pd.DataFrame:
+    # Garante as mesmas categorias mesmo em arquivos salvos como texto
+    return read_dataset(path).astype(STATUS)
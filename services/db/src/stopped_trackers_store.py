@@ -0,0 +1,132 @@
+import os
+import re
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from src.incremental import day_hashes, load_manifest, save_manifest
+from src.storage import apply_dtype, storage_profile, write_parquet
+
+""" Potência com trackers parados em formato longo (timestamp, angle, power),
+particionada por ângulo e mês em <raiz>/angle=<ângulo>/month=<AAAA-MM>/.
+Cada ângulo tem um manifesto (_days.json) com o hash da potência de cada dia.
+Não depende do pvIFSC, podendo ser lida pelas dashboards e notebooks """
+PARTITIONING = ds.partitioning(
+    pa.schema([("angle", pa.int16()), ("month", pa.string())]), flavor="hive"
+)
+ANGLE_PATTERN = re.compile(r"^angle=(-?\d+)$")
+
+
+def angle_path(path: str, angle: int) -> str:
+    return os.path.join(path, f"angle={angle}")
+
+
+def stored_angles(path: str) -> list[int]:
+    if not os.path.isdir(path):
+        return []
+
+    return sorted(
+        int(match.group(1))
+        for match in map(ANGLE_PATTERN.match, os.listdir(path))
+        if match is not None
+    )
+
+
+def write_angle(path: str, angle: int, power: pd.Series) -> None:
+    # Os arquivos são escritos em um diretório oculto e movidos de uma só vez, de
+    # modo que um ângulo interrompido nunca aparece como concluído
+    tmp_path = os.path.join(path, f".angle={angle}.tmp")
+
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    # A potência é salva em float32, a menos que o perfil de armazenamento indique
+    profile = {"dtype": "float32", **storage_profile(path)}
+
+    for month, power_month in power.groupby(power.index.to_period("M")):
+        month_path = os.path.join(tmp_path, f"month={month}")
+        os.makedirs(month_path)
+
+        write_parquet(
+            pd.DataFrame({"timestamp": power_month.index, "power": power_month}),
+            os.path.join(month_path, "part-0.parquet"),
+            profile,
+            index=False,
+        )
+
+    # O hash usa os valores como foram salvos
+    save_manifest(tmp_path, day_hashes([apply_dtype(power.to_frame("power"), profile)]))
+
+    remove_angle(path, angle)
+    os.replace(tmp_path, angle_path(path, angle))
+
+
+def remove_angle(path: str, angle: int) -> None:
+    if os.path.isdir(angle_path(path, angle)):
+        shutil.rmtree(angle_path(path, angle))
+
+
+def stored_day_hashes(path: str) -> pd.DataFrame:
+    # Hash de cada dia (linhas) e ângulo (colunas), lido dos manifestos sem abrir
+    # as partições
+    hashes = {}
+
+    for angle in stored_angles(path):
+        manifest = load_manifest(angle_path(path, angle))
+
+        # Ângulos gravados antes do manifesto são lidos e hasheados
+        if not manifest:
+            power = read_stopped_trackers(path, angles=[angle])
+            manifest = day_hashes([power.set_index("timestamp")[["power"]]])
+
+        hashes[angle] = manifest
+
+    hashes = pd.DataFrame(hashes)
+    hashes.index = pd.DatetimeIndex(hashes.index)
+
+    return hashes
+
+
+def read_stopped_trackers(
+    path: str,
+    angles: list[int] | None = None,
+    begin: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+
+    # Os filtros de ângulo e mês descartam partições inteiras sem abrir os arquivos
+    conditions = []
+    if angles is not None:
+        conditions.append(ds.field("angle").isin(list(angles)))
+    if begin is not None:
+        begin = pd.Timestamp(begin)
+        conditions.append(ds.field("month") >= begin.strftime("%Y-%m"))
+        conditions.append(ds.field("timestamp") >= begin)
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions.append(ds.field("month") <= end.strftime("%Y-%m"))
+        conditions.append(ds.field("timestamp") <= end)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=["timestamp", "angle", "power"], filter=expression)
+
+    return (
+        table.to_pandas()
+        .sort_values(["angle", "timestamp"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def pivot_angles(stopped_trackers_power: pd.DataFrame) -> pd.DataFrame:
+    # Uma coluna por ângulo (inteiro), indexada pelo timestamp
+    wide = stopped_trackers_power.pivot(
+        index="timestamp", columns="angle", values="power"
+    )
+    wide.columns = wide.columns.astype(int)
+
+    return wide.rename_axis(index=None, columns=None)
@@ -0,0 +1,86 @@
+import json
+import os
+from functools import cache
+
+import pandas as pd
+
+PLANTS_PARAM_PATH = "resources/solar_plants.json"
+
+""" Perfil de armazenamento dos datasets do datawarehouse, configurado por usina em
+"storage" no solar_plants.json. A chave "default" vale para todos os datasets e
+pode ser sobrescrita pela chave de cada dataset. Sem perfil, os arquivos são
+escritos com os padrões do pandas """
+PROFILE_KEYS = [
+    "dtype",
+    "compression",
+    "compression_level",
+    "row_group_size",
+    "use_dictionary",
+]
+
+""" O "dtype" só é aplicado às séries temporais dos sensores e das simulações. As
+tabelas derivadas (perdas e agregados) mantêm a precisão do pandas, pois o CSI é
+comparado com os limites dos intervalos e as perdas são exibidas nas dashboards """
+TIME_SERIES_DATASETS = [
+    "clearsky",
+    "wind_speed",
+    "amb_temp",
+    *[
+        f"{dataset}_{status}"
+        for dataset in ["gti", "ghi", "ca_power", "teoric_irradiance", "teoric_power"]
+        for status in ["avg", "original"]
+    ],
+    "stopped_trackers_power",
+]
+
+
+@cache
+def load_plants_param() -> dict:
+    # Carregado sob demanda, para que os leitores que importam este módulo possam
+    # ser usados fora da raiz do projeto
+    with open(PLANTS_PARAM_PATH) as file:
+        return json.load(file)
+
+
+def storage_profile(path: str) -> dict:
+    path = os.path.normpath(path)
+
+    for plant in load_plants_param().values():
+        for dataset, dataset_path in plant.get("datawarehouse", {}).items():
+            if os.path.normpath(dataset_path) != path:
+                continue
+
+            storage = plant.get("storage", {})
+
+            profile = {**storage.get("default", {}), **storage.get(dataset, {})}
+
+            if dataset not in TIME_SERIES_DATASETS:
+                profile.pop("dtype", None)
+
+            return profile
+
+    return {}
+
+
+def apply_dtype(data: pd.DataFrame, profile: dict) -> pd.DataFrame:
+    if "dtype" not in profile:
+        return data
+
+    # Apenas as colunas numéricas de ponto flutuante são convertidas
+    columns = data.select_dtypes("floating").columns
+
+    return data.astype({column: profile["dtype"] for column in columns})
+
+
+def write_parquet(
+    data: pd.DataFrame, path: str, profile: dict | None = None, **kwargs
+) -> None:
+    profile = profile or {}
+
+    unknown = set(profile) - set(PROFILE_KEYS)
+    if unknown:
+        raise ValueError(f"Parâmetros de armazenamento desconhecidos: {unknown}")
+
+    options = {key: value for key, value in profile.items() if key != "dtype"}
+
+    apply_dtype(data, profile).to_parquet(path, **options, **kwargs)
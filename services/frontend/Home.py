@@ -1,4 +1,5 @@
 import streamlit as st
+from data.profiling import begin, sidebar
 from screens.loss_table_page import loss_table_page
 from screens.method_test_page import method_test_page
 from screens.pyranometer_page import pyranometer_page
@@ -37,12 +38,18 @@ page = option_menu(
 
 # Renderiza a página selecionada
 if __name__ == "__main__":
-    match page:
-        case "Página inicial":
-            st.session_state.clear()
-        case "Piranômetros":
-            pyranometer_page()
-        case "Análise das perdas":
-            loss_table_page()
-        case "Comparação entre o método e a biblioteca":
-            method_test_page()
+    begin(page)
+
+    try:
+        match page:
+            case "Página inicial":
+                st.session_state.clear()
+            case "Piranômetros":
+                pyranometer_page()
+            case "Análise das perdas":
+                loss_table_page()
+            case "Comparação entre o método e a biblioteca":
+                method_test_page()
+    finally:
+        # Tempos das etapas medidas, quando o perfil de execução está ativo
+        sidebar()
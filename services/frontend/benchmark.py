@@ -0,0 +1,170 @@
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from screens.pyranometer_page import COLORS, gantt_figure, gantt_frame
+
+STATUSES = list(COLORS.keys())
+
+
+def timed(function: Callable, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - begin)
+
+    return min(timings)
+
+
+def synthetic_classification(days: int, sensors: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    # Dois turnos por dia (manhã e tarde), como na saída do pipeline
+    dates = pd.date_range("2020-01-01", periods=days, freq="D")
+    index = pd.DatetimeIndex(
+        np.sort(
+            np.concatenate(
+                [dates + pd.Timedelta(hours=5), dates + pd.Timedelta(hours=12)]
+            )
+        )
+    )
+
+    columns = [f"Piranômetro {i}" for i in range(sensors)] + ["GHI"]
+
+    return pd.DataFrame(
+        rng.choice(STATUSES, (len(index), len(columns))),
+        index=index,
+        columns=columns,
+    ).astype(pd.CategoricalDtype(STATUSES))
+
+
+def legacy_gantt_chart(
+    classification: pd.DataFrame, begin: pd.Timestamp, end: pd.Timestamp
+) -> tuple[pd.DataFrame, go.Figure]:
+    gantt_list = []
+    for date in pd.date_range(begin, end):
+        day_class = classification.loc[classification.index.date == date.date()].copy()
+
+        day_class["start"] = [
+            date,
+            day_class.index[1],
+        ]
+        day_class["end"] = [
+            day_class.index[1] - pd.Timedelta(seconds=1),
+            date + pd.Timedelta(hours=23, minutes=59, seconds=59),
+        ]
+
+        sensors_list = []
+        for sensor in day_class.iloc[:, :-2]:
+            df = pd.DataFrame()
+
+            df["sensor"] = [sensor] * len(day_class)
+            df["status"] = day_class[sensor].values
+            df["start"] = day_class["start"].values
+            df["end"] = day_class["end"].values
+            df.index = [date] * len(day_class)
+
+            sensors_list.append(df)
+
+        gantt_list.append(pd.concat(sensors_list))
+
+    gantt_chart = pd.concat(gantt_list)
+
+    gantt_chart["description"] = gantt_chart.apply(
+        lambda row: f"{row['sensor']} <br>{row['start']} - {row['end']} <br>{row['status']}",
+        axis=1,
+    )
+
+    gc = go.Figure(
+        data=[
+            go.Scatter(
+                x=[row["start"], row["end"]],
+                y=[row["sensor"]] * 5,
+                mode="lines",
+                line=dict(color=COLORS[row["status"]], width=25),
+                text=row["description"],
+                hoverinfo="text",
+                name=row["sensor"],
+                legendgroup=row["sensor"],
+            )
+            for _, row in gantt_chart.iterrows()
+        ]
+    )
+
+    sensor_order = {
+        sensor: i for i, sensor in enumerate(gantt_chart["sensor"].unique())
+    }
+
+    gc.data = sorted(gc.data, key=lambda trace: sensor_order[trace.name], reverse=True)
+
+    return gantt_chart, gc
+
+
+def vectorized_gantt_chart(
+    classification: pd.DataFrame, begin: pd.Timestamp, end: pd.Timestamp
+) -> tuple[pd.DataFrame, go.Figure]:
+    gantt = gantt_frame(classification, begin, end)
+
+    return gantt, gantt_figure(gantt, list(classification.columns))
+
+
+def benchmark_gantt(args: argparse.Namespace) -> None:
+    print(
+        f"{'dias':>5} {'sensores':>9} {'anterior (s)':>13} {'traços':>7} "
+        f"{'vetorizado (s)':>15} {'traços':>7}"
+    )
+
+    for days in args.days:
+        classification = synthetic_classification(days, args.sensors)
+
+        begin = classification.index.min().normalize()
+        end = classification.index.max().normalize()
+
+        start = time.perf_counter()
+        legacy_gantt, legacy_figure = legacy_gantt_chart(classification, begin, end)
+        legacy = time.perf_counter() - start
+
+        vectorized = timed(lambda: vectorized_gantt_chart(classification, begin, end))
+
+        gantt, figure = vectorized_gantt_chart(classification, begin, end)
+
+        # Os mesmos turnos, com os mesmos horários e descrições
+        columns = ["sensor", "start", "end", "description"]
+        pd.testing.assert_frame_equal(
+            legacy_gantt.astype({"status": str})
+            .sort_values(columns)
+            .reset_index(drop=True)[gantt.columns],
+            gantt.sort_values(columns).reset_index(drop=True),
+        )
+
+        print(
+            f"{days:>5} {args.sensors:>9} {legacy:>13.3f} {len(legacy_figure.data):>7} "
+            f"{vectorized:>15.4f} {len(figure.data):>7}"
+        )
+
+
+BENCHMARKS = {
+    "gantt": benchmark_gantt,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Mede o desempenho da construção dos gráficos das dashboards"
+        " com dados sintéticos"
+    )
+    parser.add_argument("benchmark", choices=list(BENCHMARKS.keys()))
+    parser.add_argument("--days", nargs="+", type=int, default=[30, 365])
+    parser.add_argument("--sensors", type=int, default=10)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    BENCHMARKS[args.benchmark](args)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pandas as pd
+import streamlit as st
+
+# Módulos do pipeline (src), como a assinatura e os caminhos dos datasets
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "db"))
+
+from src.datastore import signature  # noqa: E402
+
+""" Camada de leitura compartilhada pelas dashboards. Os DataFrames ficam em um
+cache do processo (st.cache_resource), sendo o mesmo objeto para todas as sessões,
+e são invalidados quando o arquivo muda (mtime e tamanho) ou após CACHE_TTL
+segundos. Por serem compartilhados, os DataFrames retornados não devem ser
+alterados in-place """
+CACHE_TTL = 60 * 60
+CACHE_ENTRIES = 64
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_dataset(
+    path: str, columns: tuple[str, ...] | None, signature: tuple
+) -> pd.DataFrame:
+    # A assinatura só faz parte da chave do cache
+    return pd.read_parquet(path, columns=None if columns is None else list(columns))
+
+
+def read_dataset(path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    return load_dataset(
+        path, None if columns is None else tuple(columns), signature(path)
+    )
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from data.loader import CACHE_ENTRIES, CACHE_TTL, read_dataset, signature
+
+""" Níveis de detalhe para as séries temporais das dashboards. Cada nível k guarda,
+para blocos de 2^k amostras, o mínimo e o máximo de cada coluna com o horário em
+que ocorreram. Uma janela é desenhada com o nível mais detalhado que caiba em
+MAX_POINTS pontos por traço, preservando picos e vales da série original """
+MAX_POINTS = 4000
+
+
+def pair_extremes(
+    values: np.ndarray, times: np.ndarray, lower: bool
+) -> tuple[np.ndarray, np.ndarray]:
+    # Une os blocos dois a dois, completando o último com NaN quando necessário
+    if len(values) % 2:
+        values = np.concatenate([values, np.full((1, values.shape[1]), np.nan)])
+        times = np.concatenate([times, times[-1:]])
+
+    left, right = values[0::2], values[1::2]
+
+    take_right = np.isnan(left) | ((right < left) if lower else (right > left))
+
+    return (
+        np.where(take_right, right, left),
+        np.where(take_right, times[1::2], times[0::2]),
+    )
+
+
+def build_pyramid(data: pd.DataFrame) -> list[dict]:
+    values = data.to_numpy(dtype="float64")
+    # Sem cópia: o primeiro nível já gera arrays novos
+    times = np.broadcast_to(data.index.to_numpy()[:, None], values.shape)
+
+    levels = []
+
+    current = {
+        "start": data.index.to_numpy(),
+        "min": values,
+        "min_time": times,
+        "max": values,
+        "max_time": times,
+    }
+
+    while len(current["start"]) > 1:
+        min_values, min_times = pair_extremes(
+            current["min"], current["min_time"], lower=True
+        )
+        max_values, max_times = pair_extremes(
+            current["max"], current["max_time"], lower=False
+        )
+
+        current = {
+            "start": current["start"][0::2],
+            "min": min_values,
+            "min_time": min_times,
+            "max": max_values,
+            "max_time": max_times,
+        }
+
+        levels.append(current)
+
+    return levels
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_pyramid(path: str, signature: tuple) -> list[dict]:
+    return build_pyramid(read_dataset(path))
+
+
+def window_slice(index: np.ndarray, begin: pd.Timestamp, end: pd.Timestamp) -> slice:
+    first = np.searchsorted(index, np.datetime64(begin), side="left")
+    last = np.searchsorted(index, np.datetime64(end), side="right")
+
+    return slice(first, last)
+
+
+def read_decimated(
+    path: str,
+    begin: pd.Timestamp,
+    end: pd.Timestamp,
+    max_points: int = MAX_POINTS,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    # Retorna (x, y) de cada coluna, com no máximo max_points pontos por coluna
+    data = read_dataset(path)
+
+    window = window_slice(data.index.to_numpy(), begin, end)
+
+    if window.stop - window.start <= max_points:
+        return {
+            column: (
+                data.index[window].to_numpy(),
+                data[column].iloc[window].to_numpy(),
+            )
+            for column in data.columns
+        }
+
+    # Nível mais detalhado em que a janela cabe em max_points / 2 blocos
+    for level in load_pyramid(path, signature(path)):
+        window = window_slice(level["start"], begin, end)
+
+        if window.stop - window.start <= max_points // 2:
+            break
+
+    series = {}
+    for i, column in enumerate(data.columns):
+        min_times = level["min_time"][window, i]
+        max_times = level["max_time"][window, i]
+        min_values = level["min"][window, i]
+        max_values = level["max"][window, i]
+
+        # Em cada bloco, o mínimo e o máximo são desenhados em ordem cronológica
+        min_first = min_times <= max_times
+
+        x = np.empty(2 * len(min_times), dtype=min_times.dtype)
+        y = np.empty(2 * len(min_values))
+
+        x[0::2] = np.where(min_first, min_times, max_times)
+        x[1::2] = np.where(min_first, max_times, min_times)
+        y[0::2] = np.where(min_first, min_values, max_values)
+        y[1::2] = np.where(min_first, max_values, min_values)
+
+        series[column] = (x, y)
+
+    return series
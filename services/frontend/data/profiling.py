@@ -0,0 +1,160 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+import structlog
+from plotly.basedatatypes import BaseTraceType
+
+""" Medição do tempo de cada etapa de uma execução das dashboards (leitura dos
+dados, montagem das figuras e envio ao navegador). Fica desligada por padrão e é
+ativada com a variável de ambiente DASHBOARD_PROFILE=1 ou com ?profile=1 na URL.
+Quando ativa, cada etapa gera um evento do structlog e a barra lateral mostra o
+tempo, o tamanho em bytes e as linhas/pontos da execução atual """
+PROFILE_ENV = "DASHBOARD_PROFILE"
+
+# O Streamlit executa o script de cada sessão em uma thread própria
+RUN = threading.local()
+
+
+def begin(page: str) -> None:
+    RUN.enabled = (
+        os.environ.get(PROFILE_ENV, "0") != "0"
+        or st.query_params.get("profile", "0") != "0"
+    )
+    RUN.page = page
+    RUN.steps = []
+    RUN.depth = 0
+    RUN.overhead = 0.0
+
+
+def enabled() -> bool:
+    return getattr(RUN, "enabled", False)
+
+
+def trace_points(trace: BaseTraceType) -> int:
+    for values in (trace.x, trace.y):
+        if values is not None:
+            return len(values)
+
+    return 0
+
+
+def measure(result: object) -> tuple[int | None, int | None]:
+    # Retorna (bytes, linhas ou pontos) do resultado de uma etapa
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum()), len(result)
+
+    if isinstance(result, go.Figure):
+        return len(pio.to_json(result, validate=False).encode()), sum(
+            trace_points(trace) for trace in result.data
+        )
+
+    return None, None
+
+
+def record(
+    step: str,
+    function: Callable,
+    measured: object = None,
+    dataset: str | None = None,
+) -> object:
+    log = structlog.get_logger()
+
+    # A entrada é criada antes da execução para manter a ordem das chamadas
+    entry = {"Etapa": step, "Dataset": dataset, "Nível": RUN.depth}
+    RUN.steps.append(entry)
+
+    RUN.depth += 1
+    overhead = RUN.overhead
+    start = time.perf_counter()
+    try:
+        result = function()
+    finally:
+        # Desconta o tempo gasto medindo as etapas internas
+        elapsed = time.perf_counter() - start - (RUN.overhead - overhead)
+        RUN.depth -= 1
+
+    start = time.perf_counter()
+    size, points = measure(result if measured is None else measured)
+    RUN.overhead += time.perf_counter() - start
+
+    entry.update(
+        {
+            "Tempo (ms)": round(elapsed * 1000, 1),
+            "Bytes": size,
+            "Linhas/pontos": points,
+        }
+    )
+
+    log.info(
+        "Etapa da dashboard",
+        page=RUN.page,
+        step=step,
+        dataset=dataset,
+        seconds=round(elapsed, 4),
+        bytes=size,
+        points=points,
+    )
+
+    return result
+
+
+def profiled(function: Callable) -> Callable:
+    # O argumento "dataset", quando existe, identifica o dataset lido pela etapa
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled():
+            return function(*args, **kwargs)
+
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+
+        return record(
+            function.__name__,
+            lambda: function(*args, **kwargs),
+            dataset=arguments.arguments.get("dataset"),
+        )
+
+    return wrapper
+
+
+def plotly_chart(fig: go.Figure, **kwargs) -> object:
+    # Mede st.plotly_chart, que serializa a figura e a envia ao navegador
+    if not enabled():
+        return st.plotly_chart(fig, **kwargs)
+
+    title = fig.layout.title.text or kwargs.get("key") or "figura"
+
+    # O tamanho do envio é o da figura serializada
+    return record(
+        f"st.plotly_chart ({title})", lambda: st.plotly_chart(fig, **kwargs), fig
+    )
+
+
+def sidebar() -> None:
+    if not enabled() or not RUN.steps:
+        return
+
+    steps = pd.DataFrame(RUN.steps).astype({"Bytes": "Int64", "Linhas/pontos": "Int64"})
+    steps["Etapa"] = steps["Nível"].map(lambda depth: "· " * depth) + steps["Etapa"]
+
+    # O total considera apenas as etapas de primeiro nível
+    total = steps.loc[steps["Nível"] == 0, "Tempo (ms)"].sum()
+
+    with st.sidebar:
+        st.subheader("Perfil de execução")
+        st.caption(f"{RUN.page}: {total:.1f} ms nas etapas medidas")
+        st.dataframe(
+            steps.drop(columns="Nível"),
+            hide_index=True,
+            use_container_width=True,
+        )
@@ -1,19 +1,32 @@
 import json
-import math
 
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
+from data.loader import read_dataset
+from data.profiling import plotly_chart, profiled
+from src.datastore import datawarehouse_path
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
+COLUMNS = ["Data", "CSI", "Angulação (°)", "Perda (%)"]
 
 
-def get_data() -> None:
-    solar_plant = st.session_state.solar_plant
+@profiled
+def get_data(dataset: str = "loss_table") -> pd.DataFrame:
+    return read_dataset(
+        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"][dataset],
+        COLUMNS,
+    )
+
 
-    st.session_state.loss_table = pd.read_parquet(
-        PLANTS_PARAM[solar_plant]["datawarehouse"]["loss_table"]
+@profiled
+def get_aggregate(dataset: str) -> pd.DataFrame:
+    # Sem caminho configurado, os agregados ficam ao lado da tabela de perdas
+    return read_dataset(
+        datawarehouse_path(
+            PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"], dataset
+        )
     )
 
 
@@ -63,66 +76,6 @@ def create_grouped_csi_scatter(data: pd.DataFrame, title: str, color: str) -> go
     )
 
 
-def calculate_interval(loss_table: pd.DataFrame, step: float) -> pd.DataFrame:
-    csi_range = np.arange(0, 1 - step, step)
-
-    table_list = [
-        loss_table[
-            (loss_table["CSI"] >= round(csi, 2))
-            & (loss_table["CSI"] < round(csi + step, 2))
-        ]
-        for csi in csi_range
-    ]
-
-    # Tratamento especial para o último intervalo
-    last_interval = loss_table[
-        (loss_table["CSI"] >= 1 - step) & (loss_table["CSI"] <= 1)
-    ]
-    table_list.append(last_interval)
-
-    return pd.DataFrame(
-        {
-            "Intervalo CSI": [f"[{csi:.2f}, {csi + step:.2f})" for csi in csi_range]
-            + [f"[{1 - step:.2f}, 1.00]"],
-            "Número de dias": [len(table) for table in table_list],
-            "Perda mínima (%)": [table["Perda (%)"].min() for table in table_list],
-            "Perda média (%)": [
-                round(table["Perda (%)"].mean(), 2) for table in table_list
-            ],
-            "Perda máxima (%)": [table["Perda (%)"].max() for table in table_list],
-        }
-    )
-
-
-def calculcate_quantile(loss_table: pd.DataFrame, quantile: float) -> pd.DataFrame:
-    table_by_csi = loss_table.sort_values(by="CSI").reset_index(drop=True)
-
-    length = math.ceil(len(table_by_csi) * quantile)
-
-    quant_list = []
-    begin = 0
-    for end in range(length, len(table_by_csi) + length, length):
-        table = table_by_csi.loc[begin : end - 1]
-
-        quant_list.append(
-            pd.DataFrame(
-                {
-                    "Intervalo CSI": [
-                        f"[{table['CSI'].min():.2f}, {table['CSI'].max():.2f}]"
-                    ],
-                    "Número de dias": len(table),
-                    "Perda mínima (%)": table["Perda (%)"].min(),
-                    "Perda média (%)": round(table["Perda (%)"].mean(), 2),
-                    "Perda máxima (%)": table["Perda (%)"].max(),
-                }
-            )
-        )
-
-        begin = end
-
-    return pd.concat(quant_list, ignore_index=True)
-
-
 def start_page() -> None:
     def generate_keys(defaults: dict) -> None:
         # Inicia estado da sessão
@@ -147,22 +100,20 @@ def start_page() -> None:
 
         st.session_state.first_start = False
 
-        get_data()
-
 
 def header() -> None:
     st.selectbox(
         "Selecione a usina",
         st.session_state.plants_list,
         key="solar_plant",
-        on_change=get_data,
     )
 
 
+@profiled
 def plot_loss_per_angle_bar() -> None:
     st.title("Comportamento das perdas para diferentes ângulos")
 
-    loss_table = st.session_state.loss_table
+    loss_table = get_data()
 
     csi_upper_90 = loss_table[loss_table["CSI"] > 0.9]
     csi_lower_40 = loss_table[loss_table["CSI"] < 0.4]
@@ -216,69 +167,50 @@ def plot_loss_per_angle_bar() -> None:
                 ),
             )
 
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
 
         i += 1 if i == 0 else -1
 
 
+@profiled
 def plot_loss_per_csi_scatter() -> None:
-    def plot_scatter(
-        loss_table: pd.DataFrame,
-        title: str,
-        type: str,
-        color: str,
-        step: float = 0.1,
-    ) -> None:
-        if type not in ["interval", "quantile"]:
-            raise ValueError(f"Tipo inválido '{type}'. Use 'interval' ou 'quantile'.")
+    def plot_scatter(dataset: str, title: str, color: str) -> None:
+        # Agregados por ângulo pré-calculados pelo pipeline (etapa loss_aggregates)
+        grouped_table = get_aggregate(dataset)
 
         for angle, col in zip([-60, 60, 0], st.columns(2) + [st.columns([1, 2, 1])[1]]):
-            angle_table = loss_table[loss_table["Angulação (°)"] == angle]
-
-            match (type):
-                case "interval":
-                    grouped_table = calculate_interval(angle_table, step)
-                case "quantile":
-                    grouped_table = calculcate_quantile(angle_table, step)
+            angle_table = grouped_table[grouped_table["Angulação (°)"] == angle]
 
             title_with_angle = f"{title} para um ângulo de {angle}°"
 
             fig_interval = create_grouped_csi_scatter(
-                grouped_table, title_with_angle, color
+                angle_table, title_with_angle, color
             )
 
             with col:
-                st.plotly_chart(fig_interval, use_container_width=True)
-
-    loss_table = st.session_state.loss_table
+                plotly_chart(fig_interval, use_container_width=True)
 
     step = 0.1
 
     st.title("Comportamento das perdas para intervalos de CSI")
-    plot_scatter(
-        loss_table, f"Perda por intervalo de {step}", "interval", "#2bace9", step
-    )
+    plot_scatter("loss_csi_interval", f"Perda por intervalo de {step}", "#2bace9")
 
     st.title("Comportamento das perdas para quantis de CSI")
     plot_scatter(
-        loss_table,
-        f"Perda por quantil de {step * 100:.0f}%",
-        "quantile",
-        "#c8c3f8",
-        step,
+        "loss_csi_quantile", f"Perda por quantil de {step * 100:.0f}%", "#c8c3f8"
     )
 
 
+@profiled
 def plot_loss_per_angle_for_one_csi_scatter() -> None:
     st.title("Comportamento das perdas para diferentes ângulos para um CSI")
 
-    loss_table = st.session_state.loss_table
+    loss_table = get_data()
 
-    loss_round = loss_table.copy()
-    loss_round["CSI"] = loss_round["CSI"].round(1)
+    csi_round = loss_table["CSI"].round(1)
 
     for csi, col in zip([0.3, 0.5, 0.7, 1], st.columns(2) + st.columns(2)):
-        csi_table = loss_round[loss_round["CSI"] == csi]
+        csi_table = loss_table[csi_round == csi]
 
         fig = go.Figure(
             data=[
@@ -320,7 +252,7 @@ def plot_loss_per_angle_for_one_csi_scatter() -> None:
         )
 
         with col:
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, use_container_width=True)
 
 
 def loss_table_page() -> None:
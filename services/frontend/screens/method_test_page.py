@@ -3,6 +3,8 @@ import json
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
+from data.loader import CACHE_ENTRIES, CACHE_TTL, read_dataset, signature
+from data.profiling import plotly_chart, profiled
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 MONTHS = {
@@ -16,8 +18,39 @@ MONTHS = {
 }
 
 
-def get_data() -> None:
-    data = st.session_state.data
+COLUMNS = [
+    "Data",
+    "CSI",
+    "Porcentagem de indisponibilidade (%)",
+    "Perda por indisponibilidade (%)",
+]
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def daily_losses(path: str, signature: tuple) -> pd.DataFrame:
+    # Agregação diária compartilhada entre as sessões, refeita quando o arquivo muda
+    data = read_dataset(path, COLUMNS).assign(
+        Data=lambda data: pd.to_datetime(data["Data"])
+    )
+
+    return (
+        data.groupby("Data")
+        .agg(
+            {
+                "CSI": "first",
+                "Porcentagem de indisponibilidade (%)": "sum",
+                "Perda por indisponibilidade (%)": "sum",
+            }
+        )
+        .reset_index()
+    )
+
+
+@profiled
+def get_data(dataset: str = "loss_due_to_unavailability") -> pd.DataFrame:
+    path = PLANTS_PARAM["Hélio"]["datawarehouse"][dataset]
+
+    data = daily_losses(path, signature(path))
     month = MONTHS[st.session_state.month]
 
     if month != 0:
@@ -25,7 +58,7 @@ def get_data() -> None:
     else:
         loss_table = data
 
-    st.session_state.loss_table = loss_table
+    return loss_table
 
 
 def generate_block(value: float, title: str, color: str) -> str:
@@ -56,7 +89,6 @@ def start_page() -> None:
 
     defaults = {
         "page": "method_test_page",
-        "first_start": True,
         "month": "Período inteiro",
     }
 
@@ -66,41 +98,18 @@ def start_page() -> None:
         st.session_state.clear()
         generate_keys(defaults)
 
-    if st.session_state.first_start:
-        data = pd.read_parquet(
-            PLANTS_PARAM["Hélio"]["datawarehouse"]["loss_due_to_unavailability"]
-        )
-        data["Data"] = pd.to_datetime(data["Data"])
-        data = (
-            data.groupby("Data")
-            .agg(
-                {
-                    "CSI": "first",
-                    "Porcentagem de indisponibilidade (%)": "sum",
-                    "Perda por indisponibilidade (%)": "sum",
-                }
-            )
-            .reset_index()
-        )
-
-        st.session_state.data = data
-
-        st.session_state.first_start = False
-
-        get_data()
-
 
 def header() -> None:
     st.selectbox(
         "Selecione o mês",
         options=list(MONTHS.keys()),
         key="month",
-        on_change=get_data,
     )
 
 
+@profiled
 def plot_day_loss_bar() -> None:
-    loss_table = st.session_state.loss_table
+    loss_table = get_data()
     month = st.session_state.month
 
     st.title(f"Perda diária devido à indisponibilidade - {month}")
@@ -165,7 +174,7 @@ def plot_day_loss_bar() -> None:
         ),
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, use_container_width=True)
 
 
 def method_test_page() -> None:
@@ -1,37 +1,60 @@
 import json
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
+from data.loader import read_dataset
+from data.lod import read_decimated
+from data.profiling import plotly_chart, profiled
 from plotly.subplots import make_subplots
 
 PLANTS_PARAM = json.load(open("resources/solar_plants.json"))
 COLORS = {"Stow": "#fcb774", "Indisponível": "#FF6961", "Disponível": "#009de9"}
 
 
-def get_data() -> None:
-    st.session_state.gti = pd.read_parquet(
-        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"]["gti_avg"]
-    )
-    st.session_state.teoric_irradiances = pd.read_parquet(
-        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"][
-            "teoric_irradiance_avg"
-        ]
-    )
-    st.session_state.ghi = pd.read_parquet(
-        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"]["ghi_avg"]
-    )
-    st.session_state.clearsky = pd.read_parquet(
-        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"]["clearsky"]
-    )
-    st.session_state.classification = pd.read_parquet(
-        PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"]["classification"]
-    )
+def dataset_path(dataset: str) -> str:
+    return PLANTS_PARAM[st.session_state.solar_plant]["datawarehouse"][dataset]
+
 
-    st.session_state.min = st.session_state.gti.index.min()
-    st.session_state.max = st.session_state.gti.index.max()
+@profiled
+def get_data(dataset: str) -> pd.DataFrame:
+    return read_dataset(dataset_path(dataset))
+
+
+def set_period() -> None:
+    # Apenas o período fica na sessão; os dados são lidos do cache compartilhado
+    gti = get_data("gti_avg")
+
+    st.session_state.min = gti.index.min()
+    st.session_state.max = gti.index.max()
     st.session_state.begin = st.session_state.max - pd.DateOffset(weeks=1)
 
+    reset_window()
+
+
+def reset_window() -> None:
+    st.session_state.window = None
+
+
+def select_window() -> None:
+    # A seleção de uma área no gráfico funciona como zoom, refinando os pontos
+    boxes = st.session_state.pyranometer_chart.selection.get("box", [])
+
+    if boxes:
+        begin, end = sorted(pd.Timestamp(x) for x in boxes[-1]["x"])
+
+        st.session_state.window = (begin, end)
+
+
+def visible_period() -> tuple[pd.Timestamp, pd.Timestamp]:
+    if st.session_state.get("window") is not None:
+        return st.session_state.window
+
+    begin, end = st.session_state.date_range
+
+    return pd.Timestamp(begin), pd.Timestamp(f"{end} 23:59:59")
+
 
 def start_page() -> None:
     def generate_keys(defaults: dict):
@@ -57,7 +80,7 @@ def start_page() -> None:
 
         st.session_state.first_start = False
 
-        get_data()
+        set_period()
 
 
 def header() -> None:
@@ -67,7 +90,7 @@ def header() -> None:
             "Selecione a usina",
             st.session_state.plants_list,
             key="solar_plant",
-            on_change=get_data,
+            on_change=set_period,
         )
     with cols[1]:
         min = st.session_state.min
@@ -80,33 +103,31 @@ def header() -> None:
             min_value=min,
             max_value=max,
             key="date_range",
+            on_change=reset_window,
         )
 
         if len(st.session_state.date_range) < 2:
             st.stop()
 
 
+@profiled
 def generate_temporal_series() -> go.Figure:
-    gti = st.session_state.gti
-    teoric_irradiances = st.session_state.teoric_irradiances
-    ghi = st.session_state.ghi
-    clearsky = st.session_state.clearsky
-
-    begin, end = st.session_state.date_range
-    end = pd.Timestamp(f"{end} 23:59:59")
+    begin, end = visible_period()
 
-    gti = gti.loc[begin:end]
-    teoric_irradiances = teoric_irradiances.loc[begin:end]
-    ghi = ghi.loc[begin:end]
-    clearsky = clearsky.loc[begin:end]
+    # No máximo MAX_POINTS pontos por sensor, conforme o período visível
+    series = {}
+    for dataset in ["gti_avg", "teoric_irradiance_avg", "ghi_avg"]:
+        series.update(read_decimated(dataset_path(dataset), begin, end))
 
-    df = pd.concat([gti, teoric_irradiances, ghi], axis=1)
+    clearsky_x, clearsky_y = next(
+        iter(read_decimated(dataset_path("clearsky"), begin, end).values())
+    )
 
     ts = go.Figure(
         data=[
-            go.Scatter(
-                x=df.index,
-                y=df[sensor],
+            go.Scattergl(
+                x=x,
+                y=y,
                 name=sensor,
                 legendgroup=sensor,
                 hovertemplate=(
@@ -115,13 +136,13 @@ def generate_temporal_series() -> go.Figure:
                     f"Irradiância: %{{y}} W/m²"
                 ),
             )
-            for sensor in df.columns
+            for sensor, (x, y) in series.items()
         ]
         + [
             # Adiciona GHI (ClearSky)
-            go.Scatter(
-                x=clearsky.index,
-                y=clearsky[clearsky.columns[0]],
+            go.Scattergl(
+                x=clearsky_x,
+                y=clearsky_y,
                 name="GHI teórico (clearsky)",
                 line=dict(color="gray", width=1.5, dash="dash"),
                 legendgroup="GHI teórico",
@@ -137,73 +158,92 @@ def generate_temporal_series() -> go.Figure:
     return ts
 
 
-def generate_gantt_chart() -> go.Figure:
-    classification = st.session_state.classification
-    begin, end = st.session_state.date_range
-
-    gantt_list = []
-    for date in pd.date_range(begin, end):
-        day_class = classification.loc[classification.index.date == date.date()].copy()
-
-        day_class["start"] = [
-            date,
-            day_class.index[1],
-        ]
-        day_class["end"] = [
-            day_class.index[1] - pd.Timedelta(seconds=1),
-            date + pd.Timedelta(hours=23, minutes=59, seconds=59),
-        ]
-
-        sensors_list = []
-        for sensor in day_class.iloc[:, :-2]:
-            df = pd.DataFrame()
+def gantt_frame(
+    classification: pd.DataFrame, begin: pd.Timestamp, end: pd.Timestamp
+) -> pd.DataFrame:
+    # Dias inteiros do período, com um registro por turno de classificação
+    classification = classification.loc[
+        begin.normalize() : end.normalize()
+        + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    ]
+
+    index = classification.index
+    days = index.normalize()
+
+    # Cada turno começa no próprio registro (o primeiro, à meia-noite) e termina
+    # um segundo antes do turno seguinte ou no fim do dia
+    first_shift = ~days.duplicated()
+    last_shift = np.append(days[1:] != days[:-1], True)
+
+    start = np.where(first_shift, days, index)
+    shift_end = np.where(
+        last_shift,
+        days + pd.Timedelta(hours=23, minutes=59, seconds=59),
+        np.roll(index.to_numpy(), -1) - np.timedelta64(1, "s"),
+    )
 
-            df["sensor"] = [sensor] * len(day_class)
-            df["status"] = day_class[sensor].values
-            df["start"] = day_class["start"].values
-            df["end"] = day_class["end"].values
-            df.index = [date] * len(day_class)
+    sensors = list(classification.columns)
 
-            sensors_list.append(df)
+    gantt = pd.DataFrame(
+        {
+            "sensor": np.repeat(sensors, len(index)),
+            "status": np.concatenate(
+                [classification[sensor].astype(str).to_numpy() for sensor in sensors]
+            ),
+            "start": np.tile(start, len(sensors)),
+            "end": np.tile(shift_end, len(sensors)),
+        }
+    )
 
-        gantt_list.append(pd.concat(sensors_list))
+    gantt["description"] = (
+        gantt["sensor"]
+        + " <br>"
+        + gantt["start"].astype(str)
+        + " - "
+        + gantt["end"].astype(str)
+        + " <br>"
+        + gantt["status"]
+    )
 
-    gantt_chart = pd.concat(gantt_list)
+    return gantt
 
-    gantt_chart["description"] = gantt_chart.apply(
-        lambda row: f"{row['sensor']} <br>{row['start']} - {row['end']} <br>{row['status']}",
-        axis=1,
-    )
 
+def gantt_figure(gantt: pd.DataFrame, sensors: list[str]) -> go.Figure:
+    # Uma barra horizontal por turno e sensor, em um único traço por status
     gc = go.Figure(
         data=[
-            go.Scatter(
-                x=[row["start"], row["end"]],
-                y=[row["sensor"]] * 5,
-                mode="lines",
-                line=dict(
-                    color=COLORS[row["status"]], width=25
-                ),  # Customize line appearance (increased width)
-                text=row["description"],
+            go.Bar(
+                y=status_gantt["sensor"],
+                x=(status_gantt["end"] - status_gantt["start"])
+                / pd.Timedelta(milliseconds=1),
+                base=status_gantt["start"],
+                orientation="h",
+                marker_color=COLORS[status],
+                hovertext=status_gantt["description"],
                 hoverinfo="text",
-                name=row["sensor"],  # Specify the name for the legend group
-                legendgroup=row["sensor"],  # Set the legend group identifier
+                name=status,
             )
-            for _, row in gantt_chart.iterrows()
-        ]
+            for status, status_gantt in gantt.groupby("status", sort=False)
+        ],
     )
 
-    # Cria um dicionário de mapeamento da ordem dos sensores no gantt_chart
-    sensor_order = {
-        sensor: i for i, sensor in enumerate(gantt_chart["sensor"].unique())
-    }
-
-    # Ordena gc.data com base na ordem dos sensores no gantt_chart
-    gc.data = sorted(gc.data, key=lambda trace: sensor_order[trace.name], reverse=True)
+    # O primeiro sensor fica no topo do gráfico
+    gc.update_yaxes(categoryorder="array", categoryarray=sensors[::-1])
 
     return gc
 
 
+@profiled
+def generate_gantt_chart() -> go.Figure:
+    classification = get_data("classification")
+    begin, end = visible_period()
+
+    gantt = gantt_frame(classification, begin, end)
+
+    return gantt_figure(gantt, list(classification.columns))
+
+
+@profiled
 def plot_graphs() -> None:
     fig = make_subplots(
         rows=2,
@@ -225,6 +265,13 @@ def plot_graphs() -> None:
     for trace in gc.data:
         fig.add_trace(trace, row=2, col=1)
 
+    fig.update_yaxes(
+        categoryorder="array",
+        categoryarray=gc.layout.yaxis.categoryarray,
+        row=2,
+        col=1,
+    )
+
     fig.update_yaxes(
         title_text="Irradiância (W/m²)",
         title_font=dict(size=16),
@@ -251,12 +298,28 @@ def plot_graphs() -> None:
 
     fig.update_traces(showlegend=False, row=2, col=1)
 
+    begin, end = visible_period()
+
+    fig.update_xaxes(range=[begin, end])
+
     fig.update_layout(
         height=800,
         legend=dict(font=dict(size=14)),
+        dragmode="select",
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(
+        fig,
+        use_container_width=True,
+        key="pyranometer_chart",
+        on_select=select_window,
+        selection_mode="box",
+    )
+
+    st.caption("Selecione uma área do gráfico para aproximar o período")
+
+    if st.session_state.window is not None:
+        st.button("Restaurar período", on_click=reset_window)
 
 
 def pyranometer_page() -> None: